@@ -1,7 +1,11 @@
+import os
 import random
+import time
 from collections import defaultdict, deque
 from typing import List
-import pandas as pd
+
+CSV_COLUMNS = ['Player Value', 'Dealer Card', 'Ace', 'Action', 'Reward']
+CSV_FINGERPRINT_BYTES = 4096 # bytes before the consumed offset hashed to tell an appended log from a rewritten one
 
 class ReplayBuffer:
     """Creates a circular buffer to store game experiences"""
@@ -19,90 +23,366 @@ class ReplayBuffer:
         Returns experiences to avoid sampling issues with small buffers"""
         return random.sample(list(self.buffer), min(batch_size, len(self.buffer)))
 
+    def __len__(self):
+        return len(self.buffer)
+
+class SumTree:
+    """Binary tree whose leaves hold priorities and every inner node the sum of its children,
+    giving O(log n) proportional sampling and priority updates"""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tree = [0.0] * (2 * capacity) # root at 1, leaves at [capacity, 2 * capacity)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, index):
+        return self.tree[index + self.capacity]
+
+    def update(self, index, priority):
+        """Set a leaf's priority and recompute the sums on its path to the root"""
+        pos = index + self.capacity
+        self.tree[pos] = priority
+        pos //= 2
+        while pos >= 1:
+            self.tree[pos] = self.tree[2 * pos] + self.tree[2 * pos + 1]
+            pos //= 2
+
+    def find(self, value):
+        """Index of the leaf where the cumulative priority reaches value"""
+        pos = 1
+        while pos < self.capacity:
+            left = 2 * pos
+            if value < self.tree[left]:
+                pos = left
+            else:
+                value -= self.tree[left]
+                pos = left + 1
+        return pos - self.capacity
+
+class PrioritizedReplayBuffer:
+    """Replay buffer sampling experiences proportionally to their TD error, backed by a SumTree.
+    Importance-sampling weights correct the bias, beta is annealed towards 1 while sampling"""
+    def __init__(self, capacity=10000, alpha=0.6, beta=0.4, beta_increment=0.001, epsilon=1e-3):
+        """Initialize the buffer, alpha controls how much prioritization is used (0 is uniform)"""
+        self.capacity = capacity
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon # Keeps zero-error experiences sampleable
+        self.tree = SumTree(capacity)
+        self.buffer = [None] * capacity
+        self.position = 0
+        self.size = 0
+        self.max_priority = 1.0
+
+    def add(self, experience):
+        """Adds an experience with the highest priority seen so far, so it is sampled at least once,
+        once capacity is reached the oldest experience is overwritten. Returns its index"""
+        index = self.position
+        self.buffer[index] = experience
+        self.tree.update(index, self.max_priority ** self.alpha)
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return index
+
+    def sample_with_weights(self, batch_size):
+        """Samples a batch with one draw per equal slice of the total priority.
+        Returns experiences, their indices and normalized importance-sampling weights"""
+        batch_size = min(batch_size, self.size)
+        segment = self.tree.total() / batch_size
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        indices = []
+        for i in range(batch_size):
+            index = self.tree.find(random.uniform(segment * i, segment * (i + 1)))
+            indices.append(min(index, self.size - 1)) # float rounding can land past the filled leaves
+        probabilities = [self.tree.get(index) / self.tree.total() for index in indices]
+        weights = [(self.size * probability) ** -self.beta for probability in probabilities]
+        max_weight = max(weights)
+        return [self.buffer[index] for index in indices], indices, [weight / max_weight for weight in weights]
+
+    def sample(self, batch_size):
+        """Samples experiences by priority, without the weights"""
+        return self.sample_with_weights(batch_size)[0]
+
+    def update_priorities(self, indices, td_errors):
+        """Set the priorities of sampled experiences from their latest TD errors"""
+        for index, td_error in zip(indices, td_errors):
+            priority = abs(td_error) + self.epsilon
+            self.max_priority = max(self.max_priority, priority)
+            self.tree.update(index, priority ** self.alpha)
+
+    def __len__(self):
+        return self.size
+
+def new_q_values() -> dict:
+    """Q-values of a state not seen yet (a named function keeps the Q-table picklable)"""
+    return {'hit': 0.0, 'stay': 0.0}
+
 class BlackjackRLAgent:
     """Reinforcement learning agent for playing blackjack"""
-    def __init__(self, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_min=0.01, epsilon_decay=0.995):
-        """Initialize the RL agent with given parameters"""
-        self.q_table = defaultdict(lambda: {'hit': 0.0, 'stay': 0.0}) # Maps state-action pairs to expected rewards using defaultdict
+    def __init__(self, alpha=0.1, gamma=0.95, epsilon=1.0, epsilon_min=0.01, epsilon_decay=0.995, prioritized_replay=False,
+                 learning_mode='q', n_steps=3, lam=0.9):
+        """Initialize the RL agent with given parameters, prioritized_replay samples experiences by TD error.
+        learning_mode 'q' learns one step at a time from the replay buffer, 'nstep' (n-step returns) and 'lambda' (Watkins's Q(λ)) learn from whole episodes"""
+        if learning_mode not in ('q', 'nstep', 'lambda'):
+            raise ValueError(f"Unknown learning mode '{learning_mode}', expected 'q', 'nstep' or 'lambda'")
+        self.q_table = defaultdict(new_q_values) # Maps state-action pairs to expected rewards using defaultdict
         self.alpha = alpha # Learning rate, controls how much new information overrides old
         self.gamma = gamma # Discount factor, values future rewards vs immediate ones
         self.epsilon = epsilon # Exploration rate, controls random vs learned actions
         self.epsilon_min = epsilon_min # Ensures some exploration
         self.epsilon_decay = epsilon_decay # Controls exploration reduction
-        self.replay_buffer = ReplayBuffer()
+        self.replay_buffer = PrioritizedReplayBuffer() if prioritized_replay else ReplayBuffer()
         self.batch_size = 32 # Number of experiences to learn from at once (32)
         self.training_mode = False
+        self.metrics = None # AgentMetrics once enabled, None keeps instrumentation off
+        self.learning_mode = learning_mode
+        self.n_steps = n_steps # Rewards summed before bootstrapping in 'nstep' mode
+        self.lam = lam # Trace decay in 'lambda' mode, 0 is one-step Q-learning and 1 a Monte Carlo return
+        self.episode = [] # (state, action, reward) steps of the episode in progress
 
-    def train_from_csv(self, csv_file: str, epochs: int = 1):
-        """Train the agent using historical data from a CSV file. Loads and processes historical game data validating CSV format or creating if missing, processes each row into experiences and trains for specified number of epochs decaying epsilon after each epoch"""
-        print(f"Loading training data from {csv_file}...")
+    def __getstate__(self):
+        """Pickled for run snapshots without the runtime metrics, which belong to the running process"""
+        state = self.__dict__.copy()
+        state['metrics'] = None
+        return state
+
+    def enable_metrics(self, export_path: str = None, export_format: str = 'jsonl', interval: float = 10.0):
+        """Start collecting runtime metrics, exported to export_path every interval seconds"""
+        from metrics import AgentMetrics
+        self.metrics = AgentMetrics(export_path, export_format, interval)
+        return self.metrics
+
+    def train_from_csv(self, csv_file: str, epochs: int = 1, tolerance: float = None, patience: int = None, progress=None) -> dict:
+        """Train the agent using historical data from a CSV file. Loads and processes historical game data validating CSV format or creating if missing, processes each row into experiences and trains for specified number of epochs decaying epsilon after each epoch.
+        Training stops early once the largest Q-value change of an epoch is within tolerance, the greedy policy has not changed for patience epochs or the mean Q-value change has stopped falling over patience epochs ('plateau', not converged). Returns a training report with per-epoch convergence metrics.
+        progress, if given, is called as progress(epoch, epochs, metrics) after every epoch"""
+        return self.train_experiences(self.load_csv_experiences(csv_file), epochs, tolerance, patience, progress)
+
+    def train_from_csv_tail(self, csv_file: str, checkpoint: str, epochs: int = 1, tolerance: float = None, patience: int = None, progress=None) -> dict:
+        """Train only on the rows appended to csv_file since the last call, starting from the Q-table in checkpoint.
+        The checkpoint's metadata records the byte offset and row count consumed so far and a fingerprint of the bytes
+        before the offset. If there is no checkpoint or the file was truncated or rewritten since, the Q-table is rebuilt
+        from the whole file. The replay buffer is not checkpointed, so in 'q' mode the tail rows are learned directly
+        (as learn_batch does) rather than waiting for the buffer to fill. The updated Q-table, epsilon and position are
+        written back to checkpoint, the position only advancing past rows that were learned. Returns the training report
+        of train_from_csv with 'mode' ('tail' or 'full') and 'rows' (rows trained on) added"""
+        position = None
+        initial_epsilon = self.epsilon
+        if os.path.exists(checkpoint):
+            metadata = self.load_q_table(checkpoint)
+            position = metadata.get('csv')
+            self.epsilon = metadata.get('epsilon', self.epsilon)
+        if position is not None and position.get('file') == os.path.abspath(csv_file) and self.csv_fingerprint(csv_file, position['offset']) == position['fingerprint']:
+            experiences, offset = self.read_csv_tail(csv_file, position['offset'])
+            rows = position['rows'] + len(experiences)
+            report = self.train_experiences(experiences, epochs, tolerance, patience, progress, direct=True)
+            report['mode'] = 'tail'
+            if report['stop_reason'] in ('no_data', 'no_updates'):
+                offset, rows = position['offset'], position['rows']
+        else:
+            if position is not None:
+                print(f"{csv_file} was truncated or rewritten since {checkpoint}, rebuilding the Q-table from the whole file")
+            self.q_table.clear()
+            self.replay_buffer = PrioritizedReplayBuffer() if isinstance(self.replay_buffer, PrioritizedReplayBuffer) else ReplayBuffer()
+            self.epsilon = initial_epsilon
+            experiences, offset = self.read_csv_tail(csv_file, 0)
+            rows = len(experiences)
+            report = self.train_experiences(experiences, epochs, tolerance, patience, progress)
+            report['mode'] = 'full'
+            if report['stop_reason'] in ('no_data', 'no_updates'):
+                offset, rows = 0, 0
+        report['rows'] = len(experiences)
+        self.save_q_table(checkpoint, metadata={'epsilon': self.epsilon, 'csv': {
+            'file': os.path.abspath(csv_file),
+            'offset': offset,
+            'rows': rows,
+            'fingerprint': self.csv_fingerprint(csv_file, offset),
+        }})
+        return report
+
+    @staticmethod
+    def csv_fingerprint(csv_file: str, offset: int) -> str:
+        """Hash of the header line and of the CSV_FINGERPRINT_BYTES bytes before offset, None if the file is shorter than offset"""
+        import hashlib # only needed here, keeps importing the agent fast
         try:
-            df = pd.read_csv(csv_file)
-            required_columns = ['Player Value', 'Dealer Card', 'Ace', 'Action', 'Reward']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                print(f"Warning: Missing columns in training data: {', '.join(missing_columns)}")
-                print("Expected columns: Player Value, Dealer Card, Ace, Action, Reward")
-                print("Creating empty training file with correct columns...")
-                
-                # Create empty DataFrame with correct 
-                empty_df = pd.DataFrame(columns=required_columns)
-                empty_df.to_csv(csv_file, index=False)
-                return
-                
+            with open(csv_file, "rb") as file:
+                header = file.readline()
+                file.seek(0, os.SEEK_END)
+                if file.tell() < offset:
+                    return None
+                start = max(0, offset - CSV_FINGERPRINT_BYTES)
+                file.seek(start)
+                window = file.read(offset - start)
         except FileNotFoundError:
-            print(f"Warning: {csv_file} not found. Creating new file with correct columns...")
-            empty_df = pd.DataFrame(columns=['Player Value', 'Dealer Card', 'Ace', 'Action', 'Reward'])
-            empty_df.to_csv(csv_file, index=False)
-            return
-        except pd.errors.EmptyDataError:
-            print(f"Warning: {csv_file} is empty. Starting with empty Q-table.")
-            return
+            return None
+        return hashlib.sha256(header + window).hexdigest()
+
+    def read_csv_tail(self, csv_file: str, offset: int) -> tuple:
+        """Experiences of the complete rows from byte offset on (0 reads the whole file), and the offset after the last
+        of them. A row still being written, without its newline, is left for the next call"""
+        import csv
+        try:
+            with open(csv_file, "rb") as file:
+                header = file.readline()
+                start = max(offset, len(header))
+                file.seek(start)
+                data = file.read()
+        except FileNotFoundError:
+            return self.load_csv_experiences(csv_file), 0 # warns and creates the file
+        fieldnames = next(csv.reader([header.decode()]), [])
+        if any(col not in fieldnames for col in CSV_COLUMNS):
+            return self.load_csv_experiences(csv_file), 0 # warns and rewrites it with the expected columns
+        end = data.rfind(b"\n") + 1
+        print(f"Loading {'rows appended to ' if offset else 'training data from '}{csv_file} from byte {start}...")
+        rows = csv.DictReader(data[:end].decode().splitlines(), fieldnames=fieldnames)
+        return self.csv_experiences(rows), start + end
+
+    def train_experiences(self, experiences: List[tuple], epochs: int = 1, tolerance: float = None, patience: int = None, progress=None, direct: bool = False) -> dict:
+        """Training loop of train_from_csv over already loaded experiences. direct learns every experience in 'q' mode
+        with learn_batch instead of from replay samples"""
+        report = {'epochs_run': 0, 'converged': False, 'stop_reason': 'max_epochs', 'history': []}
+        if not experiences:
+            report['stop_reason'] = 'no_data'
+            return report
         
-        print(f"Training for {epochs} epochs on {len(df)} examples...")
+        print(f"Training for {epochs} epochs on {len(experiences)} examples...")
+        stable_epochs = 0
+        learning_epochs = [] # metrics of the epochs that updated the Q-table
         for epoch in range(epochs):
-            for _, row in df.iterrows():
-                try:
-                    # Create state tuple from CSV data
-                    state = (row['Player Value'], row['Dealer Card'], bool(row['Ace']))
-                    action = row['Action'].lower()
-                    
-                    if action not in ['hit', 'stay']:
-                        print(f"Warning: Invalid action '{action}' in training data. Skipping...")
-                        continue
-                        
-                    reward = row['Reward']
-                    if reward != 0: # Game ended
-                        next_state = None
-                    else:
-                        # For continuing states, we can assume the next state from the next row
-                        # But for simplicity, we'll use None here too
-                        next_state = None
-                    
+            previous_q = {state: dict(actions) for state, actions in self.q_table.items()}
+            if self.learning_mode != 'q':
+                # Each row is a whole hand ending with its final reward, learned as a one-step episode
+                self.learn_episodes([[(state, action, reward)] for state, action, reward, _ in experiences])
+            elif direct:
+                self.learn_batch(experiences)
+            else:
+                for experience in experiences:
                     # Add to replay buffer
-                    self.replay_buffer.add((state, action, reward, next_state))
+                    self.replay_buffer.add(experience)
                     
                     # Learn from this experience
                     self.learn_from_replay()
-                    
-                except KeyError as e:
-                    print(f"Warning: Error processing row: {e}")
-                    continue
 
             # Decay epsilon after each epoch
             self.decay_epsilon()
+
+            metrics = self.q_changes(previous_q)
+            metrics['epoch'] = epoch + 1
+            report['history'].append(metrics)
+            report['epochs_run'] = epoch + 1
+            if progress is not None:
+                progress(epoch + 1, epochs, metrics)
             
             if (epoch + 1) % 10 == 0:
-                print(f"Completed epoch {epoch + 1}/{epochs}")
+                print(f"Completed epoch {epoch + 1}/{epochs} (max ΔQ {metrics['max_delta']:.5f}, "
+                      f"{metrics['policy_changes']} greedy actions changed)")
+
+            if self.learning_mode == 'q' and not direct and len(self.replay_buffer) < self.batch_size:
+                report['stop_reason'] = 'no_updates' # learn_from_replay waits for a full batch
+                continue
+            report['stop_reason'] = 'max_epochs'
+            learning_epochs.append(metrics)
+            stable_epochs = stable_epochs + 1 if metrics['policy_changes'] == 0 else 0
+
+            if tolerance is not None and metrics['max_delta'] <= tolerance:
+                report.update(converged=True, stop_reason='tolerance')
+                break
+            if patience is not None and stable_epochs >= patience:
+                report.update(converged=True, stop_reason='stable_policy')
+                break
+            if patience is not None and len(learning_epochs) >= 2 * patience:
+                recent = sum(m['mean_delta'] for m in learning_epochs[-patience:]) / patience
+                earlier = sum(m['mean_delta'] for m in learning_epochs[-2 * patience:-patience]) / patience
+                if recent >= earlier:
+                    report['stop_reason'] = 'plateau' # only fluctuating now, greedy actions may still change
+                    break
         
-        print("Training completed!")
+        if self.metrics is not None:
+            self.metrics.flush(self)
+        print(f"Training completed after {report['epochs_run']} epochs ({report['stop_reason']})")
         print(f"Q-table has {len(self.q_table)} states")
         
         print("\nExample Q-values:")
         sample_states = list(self.q_table.items())[:5]
         for state, actions in sample_states:
             print(f"State {state}: {actions}")
+        return report
+
+    def load_csv_experiences(self, csv_file: str) -> List[tuple]:
+        """Read the training CSV into (state, action, reward, next_state) experiences with the csv module. Creates the file with the expected columns if it is missing or its columns are wrong"""
+        import csv # only needed here, keeps importing the agent fast
+        print(f"Loading training data from {csv_file}...")
+        try:
+            with open(csv_file, newline="") as file:
+                reader = csv.DictReader(file)
+                if reader.fieldnames is None:
+                    print(f"Warning: {csv_file} is empty. Starting with empty Q-table.")
+                    return []
+
+                missing_columns = [col for col in CSV_COLUMNS if col not in reader.fieldnames]
+                if not missing_columns:
+                    rows = list(reader)
+        except FileNotFoundError:
+            print(f"Warning: {csv_file} not found. Creating new file with correct columns...")
+            self.create_csv(csv_file)
+            return []
+
+        if missing_columns:
+            print(f"Warning: Missing columns in training data: {', '.join(missing_columns)}")
+            print(f"Expected columns: {', '.join(CSV_COLUMNS)}")
+            print("Creating empty training file with correct columns...")
+            self.create_csv(csv_file)
+            return []
+
+        return self.csv_experiences(rows)
+
+    @staticmethod
+    def csv_experiences(rows) -> List[tuple]:
+        """(state, action, reward, next_state) experiences of the training CSV's rows (dicts keyed by CSV_COLUMNS)"""
+        experiences = []
+        for row in rows:
+            try:
+                # Create state tuple from CSV data
+                state = (int(row['Player Value']), int(row['Dealer Card']), row['Ace'].strip().lower() in ('true', '1'))
+                action = row['Action'].lower()
+                
+                if action not in ['hit', 'stay']:
+                    print(f"Warning: Invalid action '{action}' in training data. Skipping...")
+                    continue
+                    
+                reward = float(row['Reward'])
+                # Every row holds a whole game (first action and final reward), so there is no next state
+                experiences.append((state, action, reward, None))
+                
+            except (KeyError, ValueError, AttributeError) as e:
+                print(f"Warning: Error processing row: {e}")
+                continue
+        return experiences
+
+    @staticmethod
+    def create_csv(csv_file: str):
+        """Write an empty training file with the expected columns"""
+        import csv
+        with open(csv_file, mode="w", newline="") as file:
+            csv.writer(file).writerow(CSV_COLUMNS)
+
+    def q_changes(self, previous_q: dict) -> dict:
+        """Compare the Q-table with an earlier copy: max and mean absolute Q-value change and number of states whose greedy action changed"""
+        deltas = []
+        policy_changes = 0
+        for state, actions in self.q_table.items():
+            old_actions = previous_q.get(state, {'hit': 0.0, 'stay': 0.0})
+            deltas.extend(abs(actions[action] - old_actions[action]) for action in actions)
+            if max(actions.items(), key=lambda x: x[1])[0] != max(old_actions.items(), key=lambda x: x[1])[0]:
+                policy_changes += 1
+        return {
+            'max_delta': max(deltas, default=0.0),
+            'mean_delta': sum(deltas) / len(deltas) if deltas else 0.0,
+            'policy_changes': policy_changes,
+        }
     
     def get_state(self, player_cards: List, dealer_upcard) -> tuple:
         """Converts game state into a tuple format for Q-learning"""
@@ -123,17 +403,157 @@ class BlackjackRLAgent:
             return random.choice(['hit', 'stay']) # Exploration
         return max(self.q_table[state].items(), key=lambda x: x[1])[0] # Exploitation
 
+    def choose_actions(self, states) -> List[str]:
+        """Choose an action for each state of a batch (e.g. one observation per VectorEnv table)"""
+        return [self.choose_action(state) for state in states]
+
     def learn_from_replay(self):
         """Update Q-values using experiences from replay buffer. Samples batch of experiences and for each experience calculates max future Q-value and updates Q-value using formula Q(s,a) = Q(s,a) + α * (R + γ * max(Q(s')) - Q(s,a))"""
-        if len(self.replay_buffer.buffer) < self.batch_size:
+        if len(self.replay_buffer) < self.batch_size:
             return
-            
-        experiences = self.replay_buffer.sample(self.batch_size)
-        for state, action, reward, next_state in experiences:
+
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+
+        if isinstance(self.replay_buffer, PrioritizedReplayBuffer):
+            experiences, indices, weights = self.replay_buffer.sample_with_weights(self.batch_size)
+        else:
+            experiences, weights = self.replay_buffer.sample(self.batch_size), None
+        if metrics is not None:
+            sampled = time.perf_counter()
+
+        td_errors = self.update_q(experiences, weights)
+        if weights is not None:
+            self.replay_buffer.update_priorities(indices, td_errors)
+
+        if metrics is not None:
+            metrics.add_time('sample', sampled - started)
+            metrics.add_time('learn', time.perf_counter() - started)
+            metrics.count('samples')
+            metrics.count('updates', len(experiences))
+            metrics.observe_td_errors(td_errors)
+            metrics.maybe_export(self)
+
+    def observe(self, state: tuple, action: str, reward: float, next_state: tuple = None):
+        """Learn from one step of play, next_state is None when the episode ended. In 'q' mode the step goes to the replay buffer, otherwise the episode is learned as a whole once it ends"""
+        if self.learning_mode == 'q':
+            self.replay_buffer.add((state, action, reward, next_state))
+            self.learn_from_replay()
+            return
+        self.episode.append((state, action, reward))
+        if next_state is None:
+            self.learn_episode(self.episode)
+            self.episode = []
+
+    def learn_episode(self, episode: List[tuple]):
+        """Update Q-values from a whole recorded episode of (state, action, reward) steps with n-step returns or λ-returns, so the final reward reaches every earlier step in this single update"""
+        if not episode:
+            return
+        if self.metrics is not None:
+            started = time.perf_counter()
+        targets = self.nstep_targets(episode) if self.learning_mode == 'nstep' else self.lambda_targets(episode)
+        td_errors = []
+        for (state, action, _), target in zip(episode, targets):
+            td_error = target - self.q_table[state][action]
+            self.q_table[state][action] += self.alpha * td_error
+            td_errors.append(td_error)
+        if self.metrics is not None:
+            self.metrics.add_time('learn', time.perf_counter() - started)
+            self.metrics.count('updates', len(episode))
+            self.metrics.count('episodes')
+            self.metrics.observe_td_errors(td_errors)
+            self.metrics.maybe_export(self)
+
+    def learn_episodes(self, episodes):
+        """learn_episode over many recorded episodes"""
+        for episode in episodes:
+            self.learn_episode(episode)
+
+    def nstep_targets(self, episode: List[tuple]) -> List[float]:
+        """n-step return of every step: n discounted rewards, then the best Q-value n steps later if the episode goes on"""
+        T = len(episode)
+        targets = []
+        for t in range(T):
+            horizon = min(t + self.n_steps, T)
+            G = sum(self.gamma ** (k - t) * episode[k][2] for k in range(t, horizon))
+            if horizon < T:
+                G += self.gamma ** (horizon - t) * max(self.q_table[episode[horizon][0]].values())
+            targets.append(G)
+        return targets
+
+    def lambda_targets(self, episode: List[tuple]) -> List[float]:
+        """Watkins's λ-return of every step in one reverse pass, the trace is cut where the next action was exploratory (not greedy)"""
+        targets = [0.0] * len(episode)
+        G = 0.0
+        for t in range(len(episode) - 1, -1, -1):
+            reward = episode[t][2]
+            if t == len(episode) - 1:
+                G = reward
+            else:
+                next_state, next_action, _ = episode[t + 1]
+                next_q = self.q_table[next_state]
+                best_q = max(next_q.values())
+                if next_q[next_action] == best_q:
+                    G = reward + self.gamma * ((1 - self.lam) * best_q + self.lam * G)
+                else:
+                    G = reward + self.gamma * best_q
+            targets[t] = G
+        return targets
+
+    def learn_batch(self, experiences):
+        """Store a batch of fresh experiences in the replay buffer and learn from them directly. With prioritized
+        replay the fresh experiences are prioritized by their TD errors and a prioritized batch is replayed too"""
+        if self.metrics is not None:
+            started = time.perf_counter()
+        indices = [self.replay_buffer.add(experience) for experience in experiences]
+        td_errors = self.update_q(experiences)
+        prioritized = isinstance(self.replay_buffer, PrioritizedReplayBuffer)
+        if prioritized:
+            self.replay_buffer.update_priorities(indices, td_errors)
+        if self.metrics is not None:
+            self.metrics.add_time('learn', time.perf_counter() - started)
+            self.metrics.count('updates', len(experiences))
+            self.metrics.observe_td_errors(td_errors)
+            self.metrics.maybe_export(self)
+        if prioritized:
+            self.learn_from_replay() # times and counts itself
+
+    def update_q(self, experiences, weights=None):
+        """Apply the Q-learning update to each (state, action, reward, next_state) experience,
+        scaling each step by its importance-sampling weight if given. Returns the TD errors"""
+        td_errors = []
+        for i, (state, action, reward, next_state) in enumerate(experiences):
             next_max_q = 0 if next_state is None else max(self.q_table[next_state].values())
             old_q = self.q_table[state][action]
-            new_q = old_q + self.alpha * (reward + self.gamma * next_max_q - old_q)
-            self.q_table[state][action] = new_q
+            td_error = reward + self.gamma * next_max_q - old_q
+            weight = 1.0 if weights is None else weights[i]
+            self.q_table[state][action] = old_q + self.alpha * weight * td_error
+            td_errors.append(td_error)
+        return td_errors
+
+    def save_q_table(self, path: str, metadata: dict = None):
+        """Write the Q-table and optional metadata to a JSON checkpoint, atomically replacing any previous one"""
+        import json
+        checkpoint = {
+            'q_table': [[int(player_sum), int(dealer_value), bool(usable_ace), actions['hit'], actions['stay']]
+                        for (player_sum, dealer_value, usable_ace), actions in self.q_table.items()],
+            'metadata': metadata or {},
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(tmp_path, path)
+
+    def load_q_table(self, path: str) -> dict:
+        """Replace the Q-table with the one in a checkpoint written by save_q_table, returns its metadata"""
+        import json
+        with open(path) as file:
+            checkpoint = json.load(file)
+        self.q_table.clear()
+        for player_sum, dealer_value, usable_ace, q_hit, q_stay in checkpoint['q_table']:
+            self.q_table[(player_sum, dealer_value, usable_ace)] = {'hit': q_hit, 'stay': q_stay}
+        return checkpoint.get('metadata', {})
 
     def decay_epsilon(self):
         """Decay exploration rate"""
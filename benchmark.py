@@ -1,5 +1,6 @@
 import random
 from benchmark_bj import Card, Deck
+from exploring_starts import ExploringStarts
 import csv
 import os
 
@@ -91,11 +92,47 @@ def decide_action(dealer_hand, player_hand):
     return action
 
 def log_data(log_file, dealer_upvalue, first_pvalue, ace, first_action, result):
+    log_rows(log_file, [(dealer_upvalue, first_pvalue, ace, first_action, result)])
+
+def log_rows(log_file, rows):
+    """Append one row per seat of a round with a single open"""
     with open(log_file, mode="a", newline="") as file:
         writer = csv.writer(file)
-        writer.writerow([dealer_upvalue, first_pvalue, ace, first_action, result])
+        writer.writerows(rows)
+
+def play_seat(deck, dealer_hand, player_hand, label):
+    """Play a seat's hand with the basic strategy until it stays or the hand is over.
+    Returns (first player value, ace at the last decision, first action, winner), winner is
+    'dealer' while the seat waits for the dealer's turn"""
+    first_pvalue = hand_value(player_hand)
+    first_action = None
+    game_over = False
+    while not game_over:
+        print("\nDealer's cards:", Card.format_cards(dealer_hand[:1]), "[?]")
+        print(label, Card.format_cards(player_hand), "=>", hand_value(player_hand))
+
+        action = decide_action(dealer_hand, player_hand)
+        if first_action is None:
+            first_action = action
+
+        ace = any(card.number == 'A' for card in player_hand)
+
+        if action == "hit":
+            player_hand.append(deck.deal_card())
+        elif action == "stay":
+            return first_pvalue, ace, first_action, 'dealer' # resolved after the dealer's turn
+        else:
+            print("Invalid action. Please type [hit/stay].")
+
+        game_over, winner = game_result(False, player_hand, dealer_hand)
+    return first_pvalue, ace, first_action, winner
 
-def main(num_rounds):
+def main(num_rounds, seats=1, starts=None):
+    """Play num_rounds rounds with the basic strategy, every round deals `seats` player hands
+    from the same shoe against a single dealer hand and logs one row per seat. With starts (an
+    ExploringStarts) the hands start in its states instead of being dealt naturally"""
+    if seats < 1:
+        raise ValueError("seats must be at least 1")
     running = True
     wins = losses = draws = games = 0
     log_file = "game_log.csv"
@@ -111,65 +148,54 @@ def main(num_rounds):
     for round_number in range(1, num_rounds + 1):
         print(f"\n==================== NEW ROUND ====================")
 
-        dealer_hand = [deck.deal_card(), deck.deal_card()]
-        player_hand = [deck.deal_card(), deck.deal_card()]
-        game_over = False
-        dealer_turn = False
+        dealt = starts.deal_cards(deck.deck, [card.value for card in deck.deck], seats) if starts else None
+        if dealt:
+            upcard, player_hands = dealt
+            dealer_hand = [upcard, deck.deal_card()]
+        else:
+            dealer_hand = [deck.deal_card(), deck.deal_card()]
+            player_hands = [[deck.deal_card(), deck.deal_card()] for _ in range(seats)]
+        names = ["Player"] if seats == 1 else [f"Seat {seat + 1}" for seat in range(seats)]
+        labels = [f"{name}'s cards:" for name in names]
 
         # value for csv log
-        first_pvalue = hand_value(player_hand)
         dealer_upvalue = hand_value(dealer_hand[:1])
-        ace = any(card.number == 'A' for card in player_hand)
-        first_action = None
-        result = None
+        plays = [play_seat(deck, dealer_hand, player_hand, label) for player_hand, label in zip(player_hands, labels)]
 
-        while not game_over:
-            print("\nDealer's cards:", Card.format_cards(dealer_hand[:1]), "[?]")
-            print("Player's cards:", Card.format_cards(player_hand), "=>", hand_value(player_hand))
-
-            action = decide_action(dealer_hand, player_hand)
-            if first_action is None:
-                first_action = action
-
-            ace = any(card.number == 'A' for card in player_hand)
-
-            if action == "hit":
-                player_hand.append(deck.deal_card())
-            elif action == "stay":
-                dealer_turn = True
-            else:
-                print("Invalid action. Please type [hit/stay].")
-
-            game_over, winner = game_result(dealer_turn, player_hand, dealer_hand)
-
-            if dealer_turn:
-                while hand_value(dealer_hand) < 17: # dealer stay on 17
-                    dealer_hand.append(deck.deal_card())
-                game_over, winner = game_result(dealer_turn, player_hand, dealer_hand)
+        # One dealer turn for every seat that stayed
+        if any(winner == 'dealer' for *_, winner in plays):
+            while hand_value(dealer_hand) < 17: # dealer stay on 17
+                dealer_hand.append(deck.deal_card())
 
         print("\nDealer's cards:", Card.format_cards(dealer_hand), "=>", hand_value(dealer_hand))
-        print("Player's cards:", Card.format_cards(player_hand), "=>", hand_value(player_hand))
+        for player_hand, label in zip(player_hands, labels):
+            print(label, Card.format_cards(player_hand), "=>", hand_value(player_hand))
         print("\n==================== GAME OVER ====================")
 
-        if winner is None:
-            print("\nTie!")
-            draws += 1
-            result = 1
-        elif winner:
-            if is_blackjack(player_hand):
-                print("\nPlayer wins with a Blackjack!")
+        rows = []
+        for player_hand, name, (first_pvalue, ace, first_action, winner) in zip(player_hands, names, plays):
+            if winner == 'dealer':
+                _, winner = game_result(True, player_hand, dealer_hand)
+            prefix = "" if seats == 1 else f"{name}: "
+            if winner is None:
+                print(f"\n{prefix}Tie!")
+                draws += 1
+                result = 1
+            elif winner:
+                if is_blackjack(player_hand):
+                    print(f"\n{name} wins with a Blackjack!")
+                else:
+                    print(f"\n{name} wins!")
+                wins += 1
+                result = 3
             else:
-                print("\nPlayer wins!")
-            wins += 1
-            result = 3
-        else:
-            print("\nDealer wins!")
-            losses += 1
-            result = -1
-
-        log_data(log_file, dealer_upvalue, first_pvalue, ace, first_action, result)
+                print(f"\n{prefix}Dealer wins!")
+                losses += 1
+                result = -1
+            rows.append((dealer_upvalue, first_pvalue, ace, first_action, result))
+            games += 1
 
-        games += 1
+        log_rows(log_file, rows)
 
         deck.shuffle_if_needed()
 
@@ -178,4 +204,17 @@ def main(num_rounds):
     print(f"Wins percentage: {win_per:.2f}")
 
 if __name__ == "__main__":
-    main(num_rounds=10000)
\ No newline at end of file
+    import argparse
+    from profiling import add_profile_arguments, profiled
+    parser = argparse.ArgumentParser(description="Generate the training dataset with the basic strategy")
+    parser.add_argument("--rounds", type=int, default=10000, help="number of rounds to play")
+    parser.add_argument("--seats", type=int, default=1, help="player hands dealt against each dealer hand")
+    parser.add_argument("--exploring-starts", action="store_true",
+                        help="start every hand in a uniformly drawn (total, soft, upcard) state instead of dealing it")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.seats < 1:
+        parser.error("--seats must be at least 1")
+
+    with profiled(args):
+        main(num_rounds=args.rounds, seats=args.seats, starts=ExploringStarts() if args.exploring_starts else None)
\ No newline at end of file
@@ -1,6 +1,4 @@
 import random
-import numpy as np
-import pandas as pd
 from collections import defaultdict
 
 # changable variables for Monte Carlo Algoritm
@@ -65,6 +63,8 @@ class Deck:
         return deck
 
     def deal_card(self):
+        if not self.deck: # only a table with many seats can run through the whole shoe in a round
+            self.deck = self.generate_deck()
         return self.deck.pop(0)
 
     def shuffle_if_needed(self):
@@ -137,26 +137,81 @@ def create_state_values(player_hand, dealer_hand):
     """Generate current state's values"""
     return hand_value(player_hand), hand_value(dealer_hand[:1]), check_ace(player_hand)
 
-def set_q(Q, current_episode, gamma, alpha):
-    for t in range(len(current_episode)): # "time" to analyze state-action-reward
-        rewards = current_episode[t:, 2] # extract rewards from time "t"
-        discount_rate = [gamma ** i for i in range(1, len(rewards) + 1)] # reduce importance of far rewards
-        updated_reward = rewards * discount_rate # calculate future discount rewards
-        Gt = np.sum(updated_reward) # sum of future rewards
-        Q[current_episode[t][0]][current_episode[t][1]] += alpha * (Gt - Q[current_episode[t][0]][current_episode[t][1]]) # update Q(a,t) value
+class EpisodeBuffer:
+    """Preallocated storage for the (state, action, reward) steps of one Monte Carlo episode"""
+    def __init__(self, max_steps=32):
+        import numpy as np
+        self.states = np.zeros((max_steps, 3), dtype=np.int64) # player value, dealer card, ace
+        self.actions = np.zeros(max_steps, dtype=np.int64)
+        self.rewards = np.zeros(max_steps, dtype=np.float64)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def record(self, state, action, reward=0):
+        """Store a single step, doubling the buffers if the episode outgrows them"""
+        if self.length == len(self.actions):
+            import numpy as np
+            self.states = np.concatenate([self.states, np.zeros_like(self.states)])
+            self.actions = np.concatenate([self.actions, np.zeros_like(self.actions)])
+            self.rewards = np.concatenate([self.rewards, np.zeros_like(self.rewards)])
+        self.states[self.length] = state
+        self.actions[self.length] = action
+        self.rewards[self.length] = reward
+        self.length += 1
+
+    def set_final_reward(self, reward):
+        """Assign the game's outcome to the last recorded step"""
+        if self.length:
+            self.rewards[self.length - 1] = reward
+
+    def returns(self, gamma):
+        """Discounted return G_t of every step, computed in a single reverse pass"""
+        import numpy as np
+        G = np.zeros(self.length)
+        running = 0.0
+        for t in range(self.length - 1, -1, -1):
+            running = self.rewards[t] + gamma * running
+            G[t] = running
+        return G
+
+    def clear(self):
+        self.length = 0
+
+def set_q(Q, current_episode, gamma, alpha, first_visit=True):
+    """Monte Carlo update of Q from a recorded EpisodeBuffer. Returns are computed once,
+    grouped by (state, action) (first visit only or the mean of every visit) and applied as a batch"""
+    if len(current_episode) == 0:
+        return Q
+
+    G = current_episode.returns(gamma)
+    targets = {}
+    for t in range(len(current_episode)):
+        player_value, dealer_card, ace = current_episode.states[t]
+        key = ((int(player_value), int(dealer_card), bool(ace)), int(current_episode.actions[t]))
+        if key not in targets:
+            targets[key] = [G[t], 1]
+        elif not first_visit:
+            targets[key][0] += G[t]
+            targets[key][1] += 1
+
+    for (state, action), (total, visits) in targets.items():
+        Q[state][action] += alpha * (total / visits - Q[state][action]) # update Q(s,a) value
     return Q
 
 def load_training_data(log_file):
     """Load data from CSV and turn them into episodes for training. Return an episode's list [(state, action, reward)]"""
-    data = pd.read_csv(log_file)
+    import csv
     episodes = []
 
-    for _, row in data.iterrows():
-        state = (row['Player Value'], row['Dealer Card'], bool(row['Ace'])) # extract state
-        action = 0 if row['Action'] == 'stay' else 1 # extract action (0 stay, 1 hit)
-        reward = row['Reward'] # extract reward
+    with open(log_file, newline="") as file:
+        for row in csv.DictReader(file):
+            state = (int(row['Player Value']), int(row['Dealer Card']), row['Ace'] == 'True') # extract state
+            action = 0 if row['Action'] == 'stay' else 1 # extract action (0 stay, 1 hit)
+            reward = float(row['Reward']) # extract reward
 
-        episodes.append((state, action, reward))
+            episodes.append((state, action, reward))
 
     return episodes
 
@@ -170,6 +225,7 @@ def update_q_from_csv(Q, training_data, gamma, alpha):
     return Q
 
 def gen_action(state, epsilon, Q):
+    import numpy as np
     prob_hit = Q[state][1]
     prob_stay = Q[state][0]
 
@@ -184,23 +240,71 @@ def gen_action(state, epsilon, Q):
 
 ##### END AI SECTION
 
-def main():
-    AI = input("Vuoi abilitare l'AI? (s/n): ").lower() == "s"
+def play_seat(deck, dealer_hand, player_hand, label, AI, Q, current_episode):
+    """Play a seat's hand, by the AI or by asking the user, until it stays or the hand is over.
+    Returns the winner as game_result does, or 'dealer' while the seat waits for the dealer's turn"""
+    game_over = False
+    while not game_over:
+        print("\nDealer's cards:", Card.format_cards(dealer_hand[:1]), "[?]")
+        print(label, Card.format_cards(player_hand), "=>", hand_value(player_hand))
+
+        if AI:
+            current_state = create_state_values(player_hand, dealer_hand)
+            action = gen_action(current_state, epsilon, Q)
+            current_episode.record(current_state, action)
+            if action == 1: # hit
+                player_hand.append(deck.deal_card())
+            else: # stay
+                return 'dealer'
+        else:
+            action = input("\nDo you want hit or stay [h/s]?").lower()
+            if action == "h":
+                player_hand.append(deck.deal_card())
+            elif action == "s":
+                return 'dealer'
+            else:
+                print("Invalid action. Please type [h/s].")
+
+        game_over, winner = game_result(False, player_hand, dealer_hand)
+    return winner
+
+def main(AI=None, simulated_rounds=100000, seats=1, snapshot=None, snapshot_every=1000):
+    """Play in the terminal or let the Monte Carlo AI play simulated_rounds rounds. Every round deals
+    `seats` player hands from the same shoe against a single dealer hand, each seat is its own episode.
+    With a snapshot path the AI's run is saved there every snapshot_every rounds and at the end, and
+    resumes from it on the next call, following exactly the rounds an uninterrupted run would play"""
+    if seats < 1:
+        raise ValueError("seats must be at least 1")
+    import numpy as np
+    from snapshot import load_snapshot, restore_rng, rng_state, save_snapshot
+    if AI is None:
+        AI = input("Vuoi abilitare l'AI? (s/n): ").lower() == "s"
     running = True
     wins = losses = draws = games = 0
     Q = defaultdict(lambda: np.zeros(2)) # dict of state-action couples
-    current_episode = [] # sequence of state, action, reward
+    episodes = [EpisodeBuffer() for _ in range(seats)] # sequence of state, action, reward of every seat
     deck = Deck()
 
-    # Load training data from CSV
-    training_file = "game_log.csv"
-    training_data = load_training_data(training_file)
-    Q = update_q_from_csv(Q, training_data, gamma, alpha)
-
     # Simulated rounds for AI
-    simulated_rounds = 100000 if AI else None  # n. of rounds to simulate if AI is enabled
+    simulated_rounds = simulated_rounds if AI else None  # n. of rounds to simulate if AI is enabled
     ai_round_count = 0  # Counter for AI rounds  
 
+    state = load_snapshot(snapshot, 'benchmark_bj') if AI else None
+    if state is not None:
+        if state['seats'] != seats:
+            raise ValueError(f"{snapshot} was taken with {state['seats']} seats, not {seats}")
+        Q.update(state['Q'])
+        deck.deck = [Card(suit, number) for suit, number in state['deck']]
+        wins, losses, draws, games, ai_round_count = state['counters']
+        restore_rng(state['rng'])
+        print(f"Resuming from {snapshot} after {ai_round_count} rounds")
+    else:
+        # Load training data from CSV
+        training_file = "game_log.csv"
+        training_data = load_training_data(training_file)
+        Q = update_q_from_csv(Q, training_data, gamma, alpha)
+    names = ["Player"] if seats == 1 else [f"Seat {seat + 1}" for seat in range(seats)]
+
     while running:
         if simulated_rounds and ai_round_count >= simulated_rounds:
             break  # Stop simulation after the desired number of rounds
@@ -208,55 +312,46 @@ def main():
         print(f"\n==================== NEW ROUND ====================")
 
         dealer_hand = [deck.deal_card(), deck.deal_card()]
-        player_hand = [deck.deal_card(), deck.deal_card()]
-        game_over = False
-        dealer_turn = False
+        player_hands = [[deck.deal_card(), deck.deal_card()] for _ in range(seats)]
+        winners = [play_seat(deck, dealer_hand, player_hand, f"{name}'s cards:", AI, Q, current_episode)
+                   for player_hand, name, current_episode in zip(player_hands, names, episodes)]
 
-        while not game_over:
-            print("\nDealer's cards:", Card.format_cards(dealer_hand[:1]), "[?]")
-            print("Player's cards:", Card.format_cards(player_hand), "=>", hand_value(player_hand))
-
-            if AI:
-                current_state = create_state_values(player_hand, dealer_hand)
-                action = gen_action(current_state, epsilon, Q)
-                if action == 1: # hit
-                    player_hand.append(deck.deal_card())
-                else: # stay
-                    dealer_turn = True
-            else:
-                action = input("\nDo you want hit or stay [h/s]?").lower()
-                if action == "h":
-                    player_hand.append(deck.deal_card())
-                elif action == "s":
-                    dealer_turn = True
-                else:
-                    print("Invalid action. Please type [h/s].")
-
-            game_over, winner = game_result(dealer_turn, player_hand, dealer_hand)
-
-            if dealer_turn:
-                while hand_value(dealer_hand) < 17: # dealer stay on 17
-                    dealer_hand.append(deck.deal_card())
-                game_over, winner = game_result(dealer_turn, player_hand, dealer_hand)
+        # One dealer turn for every seat that stayed
+        if 'dealer' in winners:
+            while hand_value(dealer_hand) < 17: # dealer stay on 17
+                dealer_hand.append(deck.deal_card())
 
         print(f"\n==================== NEW ROUND ====================")
         print("Dealer's cards:", Card.format_cards(dealer_hand), "=>", hand_value(dealer_hand))
-        print("Player's cards:", Card.format_cards(player_hand), "=>", hand_value(player_hand))
-
-        if winner is None:
-            print("\nTie!")
-            draws += 1
-        elif winner:
-            if is_blackjack(player_hand):
-                print("\nPlayer wins with a Blackjack!")
+
+        for player_hand, name, winner, current_episode in zip(player_hands, names, winners, episodes):
+            if winner == 'dealer':
+                _, winner = game_result(True, player_hand, dealer_hand)
+            prefix = "" if seats == 1 else f"{name}: "
+            print(f"{name}'s cards:", Card.format_cards(player_hand), "=>", hand_value(player_hand))
+
+            if winner is None:
+                print(f"\n{prefix}Tie!")
+                draws += 1
+                reward = 1
+            elif winner:
+                if is_blackjack(player_hand):
+                    print(f"\n{name} wins with a Blackjack!")
+                else:
+                    print(f"\n{name} wins!")
+                wins += 1
+                reward = 3
             else:
-                print("\nPlayer wins!")
-            wins += 1
-        else:
-            print("\nDealer wins!")
-            losses += 1
+                print(f"\n{prefix}Dealer wins!")
+                losses += 1
+                reward = -1
 
-        games += 1
+            games += 1
+
+            if AI:
+                current_episode.set_final_reward(reward)
+                Q = set_q(Q, current_episode, gamma, alpha)
+                current_episode.clear()
 
         print(f"Games: {games}, Wins: {wins}, Losses: {losses}, Draws: {draws}")
         win_per = (wins * 100)/games
@@ -269,10 +364,31 @@ def main():
             if play_again != "y":
                 running = False
         else:
-            current_episode = np.array(current_episode)
-            Q = set_q(Q, current_episode, gamma, alpha)
-            current_episode = []
             ai_round_count += 1  # Increment the AI round counter
+            if snapshot and (ai_round_count % snapshot_every == 0 or ai_round_count >= simulated_rounds):
+                save_snapshot(snapshot, {
+                    'kind': 'benchmark_bj',
+                    'seats': seats,
+                    'Q': dict(Q),
+                    'deck': [(card.suit, card.number) for card in deck.deck], # plain data, loadable from any entry point
+                    'counters': (wins, losses, draws, games, ai_round_count),
+                    'rng': rng_state(),
+                })
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    from profiling import add_profile_arguments, profiled
+    parser = argparse.ArgumentParser(description="Play blackjack in the terminal or let the Monte Carlo AI play")
+    parser.add_argument("--ai", action="store_true", default=None, help="enable the AI without asking")
+    parser.add_argument("--rounds", type=int, default=100000, help="number of rounds the AI simulates")
+    parser.add_argument("--seats", type=int, default=1, help="player hands dealt against each dealer hand")
+    parser.add_argument("--snapshot", metavar="PATH", help="save the AI's run to PATH and resume from it if it exists")
+    parser.add_argument("--snapshot-every", type=int, default=1000, metavar="N", help="rounds between snapshots")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.seats < 1:
+        parser.error("--seats must be at least 1")
+
+    with profiled(args):
+        main(AI=args.ai, simulated_rounds=args.rounds, seats=args.seats,
+             snapshot=args.snapshot, snapshot_every=args.snapshot_every)
\ No newline at end of file
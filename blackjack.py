@@ -2,11 +2,16 @@ import pygame
 import random
 import sys
 import os
+import time
+import threading
+from collections import deque, namedtuple
 from typing import List
 from agent import BlackjackRLAgent
+from exploring_starts import ExploringStarts
+from profiling import add_profile_arguments, profiled, profiled_thread
+from snapshot import load_snapshot, restore_rng, rng_state, save_snapshot
 
-# Initialize Pygame and set up resource paths
-pygame.init()
+# Set up resource paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 CARDS_DIR = os.path.join(SCRIPT_DIR, 'cards')
 
@@ -17,6 +22,12 @@ CARD_WIDTH = 100
 CARD_HEIGHT = 150
 BUTTON_WIDTH = 120
 BUTTON_HEIGHT = 40
+RENDER_FPS = 60
+AI_STEP_INTERVAL = 1 / 60 # seconds between AI decisions at normal speed
+ROUND_PAUSE = 1.0 # seconds a finished round stays on screen at normal speed
+IDLE_INTERVAL = 0.01 # polling interval of the simulation thread while the AI is not playing
+MAX_SEATS = 5 # player hands that fit side by side under the dealer
+SEATS_WIDTH = 760 # horizontal space shared by the seats
 
 # Colors
 WHITE = (252, 246, 245)
@@ -25,29 +36,51 @@ GREEN = (34, 139, 34)
 RED = (220, 20, 60)
 BLACKCHART = (16, 24, 32)
 
-# Create window
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Blackjack")
-clock = pygame.time.Clock()
+# Window, created by init_display() when the game starts rather than on import
+screen = None
+clock = None
+
+def init_display():
+    """Initialize Pygame and create the game window"""
+    global screen, clock
+    if screen is None:
+        pygame.init()
+        screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        pygame.display.set_caption("Blackjack")
+        clock = pygame.time.Clock()
+
+# Immutable copy of the game state handed from the simulation to the render loop, cards are
+# (card, hidden) pairs, seats are (cards, value, result) and the chart is drawn up to chart_length points
+GameSnapshot = namedtuple('GameSnapshot', [
+    'game_state', 'seats', 'active_seat', 'dealer_cards', 'dealer_value', 'current_winner',
+    'game_count', 'total_games', 'total_wins', 'total_draws', 'epsilon', 'hit_count', 'stand_count',
+    'agent_playing', 'chart_length'])
 
 class Card:
     """Represents a playing card with suit, value and visual representation"""
+    images = {} # scaled images by file name, shared by every card so a new deck does not reload them
+
     def __init__(self, suit: str, value: str):
         self.suit = suit
         self.value = value
         self.hidden = False
         try:
-            self.image = self.load_image()
-            self.back_image = pygame.image.load(os.path.join(CARDS_DIR, 'back.png'))
-            # Scale images
-            self.image = pygame.transform.scale(self.image, (CARD_WIDTH, CARD_HEIGHT))
-            self.back_image = pygame.transform.scale(self.back_image, (CARD_WIDTH, CARD_HEIGHT))
+            self.image = self.cached_image(self.image_file())
+            self.back_image = self.cached_image('back.png')
         except pygame.error as e:
             print(f"Error loading card images: {e}")
             sys.exit(1)
 
-    def load_image(self) -> pygame.Surface:
-        """Load and return the card's image from file"""
+    @classmethod
+    def cached_image(cls, filename: str) -> pygame.Surface:
+        """Load and scale a card image the first time it is needed"""
+        if filename not in cls.images:
+            image = pygame.image.load(os.path.join(CARDS_DIR, filename))
+            cls.images[filename] = pygame.transform.scale(image, (CARD_WIDTH, CARD_HEIGHT))
+        return cls.images[filename]
+
+    def image_file(self) -> str:
+        """File name of the card's image"""
         value_map = {
             'A': 'ace', 'K': 'king', 'Q': 'queen', 'J': 'jack',
             '10': '10', '9': '9', '8': '8', '7': '7', '6': '6',
@@ -57,8 +90,7 @@ class Card:
             '♠': 'spades', '♣': 'clubs', '♥': 'hearts', '♦': 'diamonds'
         }
         
-        filename = f"{value_map[self.value]}_of_{suit_map[self.suit]}.png"
-        return pygame.image.load(os.path.join(CARDS_DIR, filename))
+        return f"{value_map[self.value]}_of_{suit_map[self.suit]}.png"
 
     def get_value(self) -> int:
         """Return the numerical value of the card"""
@@ -92,6 +124,8 @@ class Deck:
         """Draw and return the top card from the deck"""
         if len(self.cards) <= 156:  # About 3 decks
             self.reshuffle_warning = True
+        if not self.cards: # a round with several seats can use up the deck
+            self.init_deck()
         return self.cards.pop()
 
 class Button:
@@ -137,7 +171,10 @@ class WinRateChart:
         self.games.append(total_games)
         self.win_rates.append(win_rate)
     
-    def draw(self, surface):
+    def draw(self, surface, length: int = None):
+        """Draw the first length points (all by default), the lists are only ever appended to
+        so the render thread can draw a prefix while the simulation thread adds games"""
+        length = len(self.games) if length is None else length
         # Draw chart background
         pygame.draw.rect(surface, WHITE, (self.x, self.y, self.width, self.height))
         pygame.draw.rect(surface, BLACKCHART, (self.x, self.y, self.width, self.height), 2)
@@ -155,22 +192,22 @@ class WinRateChart:
             text = font.render(f"{value}%", True, BLACK)
             surface.blit(text, (self.x - 45, y_pos - 10))
 
-        if len(self.games) > 0:
-            max_games = self.games[-1]
+        if length > 0:
+            max_games = self.games[length - 1]
             for i in range(0, max_games + 1, max(1, max_games // 4)):
                 x_pos = self.x + (i / max_games) * self.width
                 font = pygame.font.Font(None, 20)
                 text = font.render(str(i), True, BLACK)
                 surface.blit(text, (x_pos - text.get_width()//2, self.y + self.height + 5))
             
-        if len(self.win_rates) < 2:
+        if length < 2:
             return
             
         # Draw win rate line
         points = []
         # Scale based on max games number for x and win rate for y
-        max_games = self.games[-1]
-        for i in range(len(self.win_rates)):
+        max_games = self.games[length - 1]
+        for i in range(length):
             x = self.x + (self.games[i] / max_games) * self.width
             y = self.y + self.height - (self.win_rates[i] * self.height / y_scale)
             points.append((x, y))
@@ -179,15 +216,109 @@ class WinRateChart:
         
         # Draw latest stats
         font = pygame.font.Font(None, 40)
-        latest_rate = self.win_rates[-1]
+        latest_rate = self.win_rates[length - 1]
         stats = f"Win Rate: {latest_rate:.1f}%"
         text = font.render(stats, True, WHITE)
         surface.blit(text, (self.x + 90, self.y - 30))
 
+class FrameProfiler:
+    """Splits every frame into phases and keeps rolling frame-time percentiles and rounds per second,
+    shown as an overlay and/or logged one CSV row per frame"""
+    PHASES = ('events', 'snapshot', 'draw_chart', 'draw_stats', 'draw_cards', 'draw_buttons', 'overlay', 'flip')
+
+    def __init__(self, window: int = 300, overlay: bool = False, log_file: str = None):
+        self.overlay = overlay
+        self.frame_times = deque(maxlen=window)
+        self.phase_times = {phase: deque(maxlen=window) for phase in self.PHASES}
+        self.round_times = deque(maxlen=window)
+        self.current = {}
+        self.frame_start = self.mark = 0.0
+        self.frame_count = 0
+        self.log = None
+        if log_file:
+            self.log = open(log_file, mode="w")
+            self.log.write(",".join(("frame", "frame_ms") + tuple(f"{phase}_ms" for phase in self.PHASES)) + "\n")
+
+    @property
+    def active(self) -> bool:
+        return self.overlay or self.log is not None
+
+    def start_frame(self):
+        if self.active:
+            self.frame_start = self.mark = time.perf_counter()
+            self.current = dict.fromkeys(self.PHASES, 0.0)
+
+    def phase(self, name: str):
+        """Charge the time since the previous mark to the given phase"""
+        if self.active:
+            now = time.perf_counter()
+            self.current[name] += now - self.mark
+            self.mark = now
+
+    def end_frame(self):
+        if not self.active:
+            return
+        self.frame_count += 1
+        frame_time = time.perf_counter() - self.frame_start
+        self.frame_times.append(frame_time)
+        for phase, seconds in self.current.items():
+            self.phase_times[phase].append(seconds)
+        if self.log is not None:
+            row = [self.frame_count, frame_time] + [self.current[phase] for phase in self.PHASES]
+            self.log.write(",".join(f"{value * 1000:.3f}" if isinstance(value, float) else str(value) for value in row) + "\n")
+
+    def round_finished(self):
+        self.round_times.append(time.perf_counter())
+
+    def percentiles(self) -> tuple:
+        """p50, p95 and p99 frame time in milliseconds over the rolling window"""
+        if not self.frame_times:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.frame_times)
+        return tuple(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 for q in (0.50, 0.95, 0.99))
+
+    def rounds_per_second(self) -> float:
+        if len(self.round_times) < 2:
+            return 0.0
+        return (len(self.round_times) - 1) / max(self.round_times[-1] - self.round_times[0], 1e-9)
+
+    def draw(self, surface):
+        """Draw frame-time percentiles, rounds/sec and the average time of every phase"""
+        if not self.overlay:
+            return
+        font = pygame.font.Font(None, 22)
+        p50, p95, p99 = self.percentiles()
+        lines = [f"frame p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms",
+                 f"rounds/s {self.rounds_per_second():.1f}"]
+        for phase in self.PHASES:
+            times = self.phase_times[phase]
+            average = sum(times) / len(times) * 1000 if times else 0.0
+            lines.append(f"{phase:<12} {average:6.2f} ms")
+        pygame.draw.rect(surface, BLACKCHART, (WINDOW_WIDTH - 330, 10, 320, 20 * len(lines) + 10))
+        for i, line in enumerate(lines):
+            surface.blit(font.render(line, True, WHITE), (WINDOW_WIDTH - 320, 15 + 20 * i))
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
 class Game:
     """Main game class handling game logic and UI"""
-    def __init__(self):
-        """Initialize the game state and UI elements"""
+    def __init__(self, perf_overlay: bool = False, perf_log: str = None, seats: int = 1,
+                 snapshot: str = None, snapshot_every: int = 100, q_checkpoint: str = None, starts=None):
+        """Initialize the game state and UI elements, optionally with the frame profiler overlay and log.
+        Every round deals `seats` player hands against a single dealer hand. With a snapshot path the
+        AI's run is saved there every snapshot_every rounds, and an existing snapshot resumes AI Play
+        where it stopped instead of training from the CSV again. With a q_checkpoint the agent starts from
+        the Q-table saved there and only trains on the CSV rows appended since. With starts (an ExploringStarts)
+        the seats start in its states instead of being dealt naturally"""
+        if not 1 <= seats <= MAX_SEATS:
+            raise ValueError(f"seats must be between 1 and {MAX_SEATS}")
+        init_display()
+        self.seats = seats
+        self.starts = starts
+        self.profiler = FrameProfiler(overlay=perf_overlay, log_file=perf_log)
         self.init_game()
         self.create_buttons()
         self.total_games = 0
@@ -196,17 +327,103 @@ class Game:
         self.total_draws = 0
         self.hit_count = 0
         self.stand_count = 0
+        self.round_count = 0
         self.ai_speed = 0  # 0 = normal, 1 = fast
         self.is_stopped = False
 
         self.chart = WinRateChart(WINDOW_WIDTH // 8, 300, 400, 200)
 
-        self.agent.train_from_csv('game_log.csv', epochs=50)
+        # The simulation thread and the render loop share the game state under this lock
+        self.lock = threading.RLock()
+        self.sim_stop = threading.Event()
+        self.round_over_at = 0.0
+
+        # CSV training runs in the background so the window opens and stays responsive,
+        # AI Play starts once training_ready is set
+        self.training_ready = threading.Event()
+        self.training_progress = (0, 50)
+        self.ai_requested = False
+        self.snapshot_path = snapshot
+        self.q_checkpoint = q_checkpoint
+        self.snapshot_every = snapshot_every
+        state = load_snapshot(snapshot, 'blackjack')
+        if state is not None:
+            self.restore_run(state)
+        else:
+            threading.Thread(target=profiled_thread(self.train_agent), args=('game_log.csv', 50), daemon=True).start()
+
+    def train_agent(self, csv_file: str, epochs: int):
+        """Train the agent from the CSV log, run on the background training thread"""
+        def progress(epoch, epochs, metrics):
+            self.training_progress = (epoch, epochs)
+        try:
+            if self.q_checkpoint:
+                self.agent.train_from_csv_tail(csv_file, self.q_checkpoint, epochs=epochs, tolerance=1e-3, patience=3, progress=progress)
+            else:
+                self.agent.train_from_csv(csv_file, epochs=epochs, tolerance=1e-3, patience=3, progress=progress)
+        except Exception as e:
+            print(f"Training failed: {e}")
+        finally:
+            self.training_ready.set()
+
+    def save_run(self):
+        """Snapshot the AI's run between two rounds. The deck is rebuilt every round, so the agent,
+        the counters, the chart and the RNG state are all a resumed run needs to deal the same rounds"""
+        if self.deck.reshuffle_warning:
+            self.deck.init_deck() # simulate() would reshuffle after the snapshot, a resumed run never does
+        save_snapshot(self.snapshot_path, {
+            'kind': 'blackjack',
+            'seats': self.seats,
+            'agent': self.agent,
+            'counters': (self.round_count, self.game_count, self.total_games, self.total_wins,
+                         self.total_losses, self.total_draws, self.hit_count, self.stand_count),
+            'chart': (self.chart.games, self.chart.win_rates, self.chart.max_rate),
+            'ai_speed': self.ai_speed,
+            'rng': rng_state(),
+        })
+
+    def restore_run(self, state: dict):
+        """Resume a run saved by save_run: AI Play starts with the next round right away"""
+        if state['seats'] != self.seats:
+            raise ValueError(f"{self.snapshot_path} was taken with {state['seats']} seats, not {self.seats}")
+        self.agent = state['agent']
+        (self.round_count, self.game_count, self.total_games, self.total_wins,
+         self.total_losses, self.total_draws, self.hit_count, self.stand_count) = state['counters']
+        self.chart.games, self.chart.win_rates, self.chart.max_rate = state['chart']
+        self.ai_speed = state['ai_speed']
+        self.speed_button.text = "Fast" if self.ai_speed else "Normal"
+        restore_rng(state['rng'])
+        print(f"Resuming from {self.snapshot_path} after {self.round_count} rounds")
+
+        self.training_ready.set()
+        self.agent_playing = True
+        self.ai_button.text = "Stop AI"
+        self.ai_button.visible = False
+        self.start_button.visible = False
+        self.stop_button.visible = True
+        self.game_state = "game_over"
+        self.round_over_at = 0.0 # simulate() deals the next round at once
+
+    def draw_training_progress(self, surface):
+        """Progress bar of the background training, hidden once it is done"""
+        if self.training_ready.is_set():
+            return
+        epoch, epochs = self.training_progress
+        x, y, width, height = WINDOW_WIDTH // 2 + 80, 40, 340, 20
+        pygame.draw.rect(surface, WHITE, (x, y, width, height), 2)
+        pygame.draw.rect(surface, WHITE, (x, y, int(width * epoch / epochs), height))
+        font = pygame.font.Font(None, 28)
+        text = font.render(f"Training ALAN: epoch {epoch}/{epochs}", True, WHITE)
+        surface.blit(text, text.get_rect(midleft=(x, y + height + 15)))
 
     def init_game(self):
         """Initialize or reset game state"""
         self.deck = Deck()
-        self.player_cards = []
+        self.player_cards = [] # hand of the seat being played, one of seat_cards
+        self.seat_cards = []
+        self.seat_results = []
+        self.seat_steps = [] # the AI's (state, action) steps of every seat, learned once the round is over
+        self.active_seat = 0
         self.dealer_cards = []
         self.game_state = "waiting"
         self.current_winner = ""
@@ -243,14 +460,15 @@ class Game:
             print(f"Dealer's cards: {' '.join(dealer_cards)}")
             
             # Log player's initial cards
-            player_cards = [str(card) for card in self.player_cards]
-            player_total = self.calculate_hand(self.player_cards)
-            print(f"Player's cards: {' '.join(player_cards)} => {player_total}")
+            for seat, cards in enumerate(self.seat_cards):
+                player_cards = [str(card) for card in cards]
+                player_total = self.calculate_hand(cards)
+                print(f"{self.seat_name(seat)}'s cards: {' '.join(player_cards)} => {player_total}")
             
         elif message == "PLAYER HITS":
             player_cards = [str(card) for card in self.player_cards]
             player_total = self.calculate_hand(self.player_cards)
-            print(f"Player's cards: {' '.join(player_cards)} => {player_total}")
+            print(f"{self.seat_name(self.active_seat)}'s cards: {' '.join(player_cards)} => {player_total}")
             
         elif message == "DEALER REVEALS":
             dealer_cards = [str(card) for card in self.dealer_cards]
@@ -285,11 +503,64 @@ class Game:
         self.log_game_state("NEW ROUND")
 
     def deal_initial_cards(self):
-        """Deal the round's initial cards"""
-        self.player_cards = [self.deck.draw(), self.deck.draw()]
-        self.dealer_cards = [self.deck.draw(), self.deck.draw()]
+        """Deal the round's initial cards, two for every seat then two for the dealer"""
+        dealt = self.starts.deal_cards(self.deck.cards, [card.get_value() for card in self.deck.cards], self.seats) if self.starts else None
+        if dealt:
+            upcard, self.seat_cards = dealt
+        else:
+            self.seat_cards = [[self.deck.draw(), self.deck.draw()] for _ in range(self.seats)]
+        self.seat_results = [""] * self.seats
+        self.seat_steps = [[] for _ in range(self.seats)]
+        self.active_seat = 0
+        self.player_cards = self.seat_cards[0]
+        self.dealer_cards = [self.deck.draw(), upcard if dealt else self.deck.draw()]
         self.dealer_cards[0].hidden = True
 
+    def seat_name(self, seat: int) -> str:
+        return "Player" if self.seats == 1 else f"Seat {seat + 1}"
+
+    def end_seat(self):
+        """The seat being played stayed or busted: move on to the next seat, or resolve the round after the last one"""
+        if self.active_seat + 1 < len(self.seat_cards):
+            self.active_seat += 1
+            self.player_cards = self.seat_cards[self.active_seat]
+            return
+        self.resolve_round()
+
+    def resolve_round(self):
+        """A single dealer's turn for every seat still in the game, then every seat's result"""
+        if any(self.calculate_hand(cards) <= 21 for cards in self.seat_cards):
+            self.dealer_play()
+        else:
+            self.dealer_cards[0].hidden = False
+        self.seat_results = [self.determine_winner(cards) for cards in self.seat_cards]
+        if self.seats == 1:
+            self.current_winner = self.seat_results[0]
+        else:
+            self.current_winner = " | ".join(f"{self.seat_name(seat)}: {result}" for seat, result in enumerate(self.seat_results))
+        if self.agent_playing:
+            self.learn_round()
+        self.handle_game_over()
+
+    def learn_round(self):
+        """Hand the AI's steps to the agent seat by seat, so that every seat is an episode of its own"""
+        for steps, result in zip(self.seat_steps, self.seat_results):
+            if not steps:
+                continue
+            if "Player wins" in result:
+                reward = 3
+            elif "Dealer wins" in result:
+                reward = -1
+            else:
+                reward = 1
+            for i, (state, action) in enumerate(steps):
+                if i + 1 < len(steps):
+                    self.agent.observe(state, action, 0, steps[i + 1][0])
+                else:
+                    self.agent.observe(state, action, reward, None)
+            if self.agent.metrics is not None and self.agent.learning_mode == 'q': # learn_episode counts its own episodes
+                self.agent.metrics.count('episodes')
+
     def calculate_hand(self, cards: List[Card]) -> int:
         """Calculate the hand value"""
         total = 0
@@ -315,9 +586,9 @@ class Game:
         while self.calculate_hand(self.dealer_cards) < 17:
             self.dealer_cards.append(self.deck.draw())
 
-    def determine_winner(self) -> str:
-        """Determine winner of the round"""
-        player_value = self.calculate_hand(self.player_cards)
+    def determine_winner(self, cards: List[Card] = None) -> str:
+        """Determine winner of the round for a seat's cards (the seat being played by default)"""
+        player_value = self.calculate_hand(self.player_cards if cards is None else cards)
         dealer_value = self.calculate_hand(self.dealer_cards)
         
         if player_value > 21:
@@ -330,22 +601,25 @@ class Game:
             return "Dealer wins!"
         return "Tie!"
 
-    def draw_cards(self, cards: List[Card], y_pos: int):
-        for i, card in enumerate(cards):
-            x_pos = (WINDOW_WIDTH//2 + 250 - (len(cards) * CARD_WIDTH)//2) + i * (CARD_WIDTH + 10)
-            screen.blit(card.back_image if card.hidden else card.image, (x_pos, y_pos))
+    def draw_cards(self, cards: List[tuple], y_pos: int, center_x: int = WINDOW_WIDTH//2 + 250, step: int = CARD_WIDTH + 10):
+        """Draw a snapshot's (card, hidden) pairs around center_x, step pixels apart"""
+        for i, (card, hidden) in enumerate(cards):
+            x_pos = (center_x - (len(cards) * CARD_WIDTH)//2) + i * step
+            screen.blit(card.back_image if hidden else card.image, (x_pos, y_pos))
 
     def handle_game_over(self, is_player_turn: bool = True):
         """Handles game over state and updates statistics"""
-        self.game_count += 1
-        self.total_games += 1
-        
-        if "Player wins" in self.current_winner:
-            self.total_wins += 1
-        elif "Dealer wins" in self.current_winner:
-            self.total_losses += 1
-        elif "Tie" in self.current_winner:
-            self.total_draws += 1
+        self.profiler.round_finished()
+
+        for result in self.seat_results:
+            self.game_count += 1
+            self.total_games += 1
+            if "Player wins" in result:
+                self.total_wins += 1
+            elif "Dealer wins" in result:
+                self.total_losses += 1
+            elif "Tie" in result:
+                self.total_draws += 1
             
         self.game_state = "game_over"
         self.log_game_state("DEALER REVEALS")
@@ -354,6 +628,9 @@ class Game:
         # Update chart
         if self.agent_playing:
             self.chart.update(self.total_games, self.total_wins)
+            self.round_count += 1
+            if self.snapshot_path and self.round_count % self.snapshot_every == 0:
+                self.save_run()
 
         # Immediate reset in fast modes
         if self.agent_playing and self.ai_speed > 0:
@@ -361,13 +638,17 @@ class Game:
             return
             
         if self.agent_playing:
-            pygame.time.set_timer(pygame.USEREVENT, 1000)
+            self.round_over_at = time.perf_counter() # simulate() starts the next round after ROUND_PAUSE
 
     def handle_ai_turn(self):
-        """Handle AI's turn"""
+        """Handle AI's turn for the seat being played, the round's steps are learned once it is resolved"""
         if self.game_state == "playing" and self.agent_playing:
             state = self.agent.get_state(self.player_cards, self.dealer_cards[1])
             action = self.agent.choose_action(state)
+            self.seat_steps[self.active_seat].append((state, action))
+            metrics = self.agent.metrics
+            if metrics is not None:
+                started, learn_seconds = time.perf_counter(), metrics.timers['learn']
             
             if action == 'hit':
                 self.hit_count += 1
@@ -376,130 +657,180 @@ class Game:
                 self.log_game_state("PLAYER HITS")
                 
                 if self.calculate_hand(self.player_cards) > 21:
-                    self.dealer_cards[0].hidden = False
-                    self.game_state = "game_over"
-                    self.current_winner = self.determine_winner()
-                    reward = -1
-                    next_state = None
-                    self.handle_game_over(is_player_turn=False)
                     self.agent.decay_epsilon()
-                else:
-                    reward = 0
-                    next_state = self.agent.get_state(self.player_cards, self.dealer_cards[1])
+                    self.end_seat()
             else:  # stand
                 self.stand_count += 1
-                self.dealer_play()
-                self.game_state = "game_over"
-                self.current_winner = self.determine_winner()
-                self.handle_game_over(is_player_turn=False)
-                self.agent.decay_epsilon()
-                
-                if "Player wins" in self.current_winner:
-                    reward = 3
-                elif "Dealer wins" in self.current_winner:
-                    reward = -1
-                else:
-                    reward = 1
-                next_state = None
-            
-            self.agent.replay_buffer.add((state, action, reward, next_state))
-            self.agent.learn_from_replay()
-            
-            if self.game_state == "game_over":
                 self.agent.decay_epsilon()
+                self.end_seat()
+
+            if metrics is not None:
+                # The step resolves the round after the last seat, without the learning done there
+                metrics.add_time('env_step', time.perf_counter() - started - (metrics.timers['learn'] - learn_seconds))
+                metrics.count('env_steps')
+
+    def toggle_ai_play(self):
+        """Toggle AI Play mode, deferred until training_ready while the agent is still training"""
+        if not self.agent_playing and not self.training_ready.is_set():
+            self.ai_requested = not self.ai_requested
+            self.ai_button.text = "Waiting..." if self.ai_requested else "AI Play"
+            return
+        self.agent_playing = not self.agent_playing
+        self.ai_button.text = "Stop AI" if self.agent_playing else "AI Play"
+        self.stop_button.visible = self.agent_playing
+        self.is_stopped = False
+        if self.agent_playing:
+            self.reset_game()
+            self.deal_initial_cards()
+
+    def snapshot(self) -> GameSnapshot:
+        """Copy of everything the render loop draws, taken under the game lock"""
+        with self.lock:
+            return GameSnapshot(
+                game_state=self.game_state,
+                seats=tuple((tuple((card, card.hidden) for card in cards), self.calculate_hand(cards), result)
+                            for cards, result in zip(self.seat_cards, self.seat_results)),
+                active_seat=self.active_seat,
+                dealer_cards=tuple((card, card.hidden) for card in self.dealer_cards),
+                dealer_value=self.calculate_hand(self.dealer_cards),
+                current_winner=self.current_winner,
+                game_count=self.game_count,
+                total_games=self.total_games,
+                total_wins=self.total_wins,
+                total_draws=self.total_draws,
+                epsilon=self.agent.epsilon,
+                hit_count=self.hit_count,
+                stand_count=self.stand_count,
+                agent_playing=self.agent_playing,
+                chart_length=len(self.chart.games),
+            )
+
+    def simulate(self):
+        """Simulation thread: plays the AI's rounds at their own pace, independent of the frame rate.
+        Normal speed makes one decision every AI_STEP_INTERVAL and pauses ROUND_PAUSE seconds after a round, fast speed never waits"""
+        while not self.sim_stop.is_set():
+            with self.lock:
+                active = self.agent_playing and not self.is_stopped
+                if active:
+                    if self.game_state == "game_over":
+                        if time.perf_counter() - self.round_over_at >= ROUND_PAUSE:
+                            self.reset_game()
+                    else:
+                        self.handle_ai_turn()
+                if self.deck.reshuffle_warning:
+                    self.deck.init_deck()
+                fast = self.ai_speed > 0
+            if not active:
+                time.sleep(IDLE_INTERVAL)
+            elif fast:
+                time.sleep(0) # let the render thread take the lock
+            else:
+                time.sleep(AI_STEP_INTERVAL)
 
-    def run(self):
-        """Handle round's game logic"""
+    def run(self, max_frames: int = None):
+        """Render loop at RENDER_FPS, handling input and drawing snapshots while simulate() plays the AI's rounds on its own thread. Stops after max_frames frames if given"""
+        self.sim_stop.clear()
+        simulation = threading.Thread(target=profiled_thread(self.simulate), daemon=True)
+        simulation.start()
         running = True
+        frames = 0
         while running:
-
-            if self.agent_playing and not self.is_stopped:
-                self.hit_button.visible = False
-                self.stay_button.visible = False
-                self.speed_button.visible = True
-                self.handle_ai_turn()
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-                if event.type == pygame.USEREVENT:
-                    if self.game_state == "game_over" and self.agent_playing and not self.is_stopped:
-                        pygame.time.set_timer(pygame.USEREVENT, 0)
-                        self.reset_game()
-                
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_pos = pygame.mouse.get_pos()
-                    
-                    if self.speed_button.visible and self.speed_button.rect.collidepoint(mouse_pos):
-                        self.ai_speed = (self.ai_speed + 1) % 2
-                        if self.ai_speed == 0:
-                            self.speed_button.text = "Normal"
-                        elif self.ai_speed == 1:
-                            self.speed_button.text = "Fast"
+            frames += 1
+            if max_frames is not None and frames > max_frames:
+                break
+            self.profiler.start_frame()
+
+            with self.lock:
+                if self.ai_requested and self.training_ready.is_set():
+                    self.ai_requested = False
+                    self.toggle_ai_play()
+
+                if self.agent_playing and not self.is_stopped:
+                    self.hit_button.visible = False
+                    self.stay_button.visible = False
+                    self.speed_button.visible = True
+
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        self.profiler.overlay = not self.profiler.overlay
                     
-                    elif self.start_button.visible and self.start_button.rect.collidepoint(mouse_pos):
-                        self.reset_game()
-                        self.deal_initial_cards()
-                    
-                    elif self.ai_button.visible and self.ai_button.rect.collidepoint(mouse_pos):
-                        self.agent_playing = not self.agent_playing
-                        self.ai_button.text = "Stop AI" if self.agent_playing else "AI Play"
-                        self.stop_button.visible = self.agent_playing
-                        self.is_stopped = False
-                        if self.agent_playing:
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                        mouse_pos = pygame.mouse.get_pos()
+                        
+                        if self.speed_button.visible and self.speed_button.rect.collidepoint(mouse_pos):
+                            self.ai_speed = (self.ai_speed + 1) % 2
+                            if self.ai_speed == 0:
+                                self.speed_button.text = "Normal"
+                            elif self.ai_speed == 1:
+                                self.speed_button.text = "Fast"
+                        
+                        elif self.start_button.visible and self.start_button.rect.collidepoint(mouse_pos):
                             self.reset_game()
                             self.deal_initial_cards()
+                        
+                        elif self.ai_button.visible and self.ai_button.rect.collidepoint(mouse_pos):
+                            self.toggle_ai_play()
 
-                    elif self.stop_button.visible and self.stop_button.rect.collidepoint(mouse_pos):
-                        self.is_stopped = not self.is_stopped
-                        self.stop_button.text = "Resume" if self.is_stopped else "Stop"
-                    
-                    elif self.hit_button.visible and self.hit_button.rect.collidepoint(mouse_pos):
-                        if self.game_state == "playing":
-                            self.player_cards.append(self.deck.draw())
-                            self.log_game_state("PLAYER HITS")
-                            
-                            if self.calculate_hand(self.player_cards) > 21:
-                                self.dealer_cards[0].hidden = False
-                                self.current_winner = self.determine_winner()
-                                self.handle_game_over()
-                    
-                    elif self.stay_button.visible and self.stay_button.rect.collidepoint(mouse_pos):
-                        if self.game_state == "playing":
-                            self.dealer_play()
-                            self.current_winner = self.determine_winner()
-                            self.handle_game_over()
+                        elif self.stop_button.visible and self.stop_button.rect.collidepoint(mouse_pos):
+                            self.is_stopped = not self.is_stopped
+                            self.stop_button.text = "Resume" if self.is_stopped else "Stop"
+                        
+                        elif self.hit_button.visible and self.hit_button.rect.collidepoint(mouse_pos):
+                            if self.game_state == "playing":
+                                self.player_cards.append(self.deck.draw())
+                                self.log_game_state("PLAYER HITS")
+                                
+                                if self.calculate_hand(self.player_cards) > 21:
+                                    self.end_seat()
+                        
+                        elif self.stay_button.visible and self.stay_button.rect.collidepoint(mouse_pos):
+                            if self.game_state == "playing":
+                                self.end_seat()
+
+                if self.game_state == "game_over" and not self.agent_playing:
+                    self.hit_button.visible = False
+                    self.stay_button.visible = False
+                    self.start_button.visible = True
+                    self.ai_button.visible = True
+
+            self.profiler.phase('events')
+
+            state = self.snapshot()
+            self.profiler.phase('snapshot')
 
             # Draw
             screen.fill(GREEN)
 
-            self.chart.draw(screen)
+            self.chart.draw(screen, state.chart_length)
+            self.profiler.phase('draw_chart')
                 
             # Draw stats
             font = pygame.font.Font(None, 45)
             dfont = pygame.font.Font(None, 45)
-            stats_games = font.render(f"Games: {self.game_count}", True, WHITE)
+            stats_games = font.render(f"Games: {state.game_count}", True, WHITE)
             stats_games_rect = stats_games.get_rect(center=(WINDOW_WIDTH // 4, 100))
             screen.blit(stats_games, stats_games_rect)
 
-            stats_wins = font.render(f"Wins: {self.total_wins}", True, WHITE)
+            stats_wins = font.render(f"Wins: {state.total_wins}", True, WHITE)
             stats_wins_rect = stats_wins.get_rect(center=(WINDOW_WIDTH // 4, 130))
             screen.blit(stats_wins, stats_wins_rect)
             
-            draws_percentage = (self.total_draws / self.total_games * 100) if self.total_games > 0 else 0
+            draws_percentage = (state.total_draws / state.total_games * 100) if state.total_games > 0 else 0
             stats_draws = dfont.render(f"Draws: {draws_percentage:.1f}%", True, WHITE)
             stats_draws_rect = stats_draws.get_rect(center=(WINDOW_WIDTH // 4, 240))
             screen.blit(stats_draws, stats_draws_rect)
 
-            if self.agent_playing:
+            if state.agent_playing:
                 font = pygame.font.Font(None, 36)
 
-                epsilon_text = font.render(f"Epsilon: {self.agent.epsilon:.3f}", True, WHITE)
+                epsilon_text = font.render(f"Epsilon: {state.epsilon:.3f}", True, WHITE)
                 epsilon_text_rect = epsilon_text.get_rect(center=(WINDOW_WIDTH // 4, 160))
                 screen.blit(epsilon_text, epsilon_text_rect)
 
-                action_text = font.render(f"Hits: {self.hit_count} | Stands: {self.stand_count}", True, WHITE)
+                action_text = font.render(f"Hits: {state.hit_count} | Stands: {state.stand_count}", True, WHITE)
                 action_text_rect = action_text.get_rect(center=(WINDOW_WIDTH // 4 + 10, WINDOW_HEIGHT // 2 + 150))
                 screen.blit(action_text, action_text_rect)
 
@@ -507,37 +838,43 @@ class Game:
                 #stands_text_rect = stands_text.get_rect(center=(WINDOW_WIDTH // 4, 220))
                 #screen.blit(stands_text, stands_text_rect)
 
-            if self.game_state != "waiting":
-                self.draw_cards(self.dealer_cards, WINDOW_HEIGHT // 2 - 250)
-                # Move player cards up
-                self.draw_cards(self.player_cards, WINDOW_HEIGHT // 2 + 100)
-                    
-                # Draw hands value
-                player_value = self.calculate_hand(self.player_cards)
-                dealer_value = self.calculate_hand(self.dealer_cards)
-                    
+            self.profiler.phase('draw_stats')
+
+            if state.game_state != "waiting":
+                self.draw_cards(state.dealer_cards, WINDOW_HEIGHT // 2 - 250)
                 value_font = pygame.font.Font(None, 30)
-                player_text = value_font.render(f"Player Hand: {player_value}", True, WHITE)
-                player_rect = player_text.get_rect(center=(WINDOW_WIDTH//2 + 250, WINDOW_HEIGHT - 125))
-                screen.blit(player_text, player_rect)
+                seats = len(state.seats)
+                for seat, (cards, value, result) in enumerate(state.seats):
+                    # Seats side by side, their cards overlapping when space runs short
+                    center_x = WINDOW_WIDTH//2 + 250 + int((seat - (seats - 1) / 2) * SEATS_WIDTH / seats)
+                    step = CARD_WIDTH + 10
+                    if seats > 1 and len(cards) > 1:
+                        step = min(step, (SEATS_WIDTH // seats - CARD_WIDTH) // (len(cards) - 1))
+                    # Move player cards up
+                    self.draw_cards(cards, WINDOW_HEIGHT // 2 + 100, center_x, step)
+
+                    # Draw hands value
+                    label = f"Player Hand: {value}" if seats == 1 else f"Seat {seat + 1}: {value}"
+                    active = seats > 1 and state.game_state == "playing" and seat == state.active_seat
+                    player_text = value_font.render(label, True, RED if active else WHITE)
+                    player_rect = player_text.get_rect(center=(center_x, WINDOW_HEIGHT - 125))
+                    screen.blit(player_text, player_rect)
+
+                    if seats > 1 and state.game_state == "game_over":
+                        result_text = value_font.render(result, True, WHITE)
+                        screen.blit(result_text, result_text.get_rect(center=(center_x, WINDOW_HEIGHT//2)))
                     
-                if self.game_state == "game_over":
-                    dealer_text = value_font.render(f"Dealer Hand: {dealer_value}", True, WHITE)
+                if state.game_state == "game_over":
+                    dealer_text = value_font.render(f"Dealer Hand: {state.dealer_value}", True, WHITE)
                     dealer_rect = dealer_text.get_rect(center=(WINDOW_WIDTH//2 + 250, WINDOW_HEIGHT//2 - 275))
                     screen.blit(dealer_text, dealer_rect)
                         
-                    winner_text = font.render(self.current_winner, True, WHITE)
-                    text_rect = winner_text.get_rect(center=(WINDOW_WIDTH//2 + 250, WINDOW_HEIGHT//2))
-                    screen.blit(winner_text, text_rect)
-                        
-                    if not self.agent_playing:
-                        self.hit_button.visible = False
-                        self.stay_button.visible = False
-                        self.start_button.visible = True
-                        self.ai_button.visible = True
+                    if seats == 1:
+                        winner_text = font.render(state.current_winner, True, WHITE)
+                        text_rect = winner_text.get_rect(center=(WINDOW_WIDTH//2 + 250, WINDOW_HEIGHT//2))
+                        screen.blit(winner_text, text_rect)
 
-            if self.deck.reshuffle_warning:
-                self.deck.init_deck()
+            self.profiler.phase('draw_cards')
 
             # Draw buttons
             self.start_button.draw(screen)
@@ -546,9 +883,22 @@ class Game:
             self.ai_button.draw(screen)
             self.stop_button.draw(screen)
             self.speed_button.draw(screen)
+            self.draw_training_progress(screen)
+            self.profiler.phase('draw_buttons')
+
+            self.profiler.draw(screen)
+            self.profiler.phase('overlay')
 
             pygame.display.flip()
+            self.profiler.phase('flip')
+            self.profiler.end_frame()
+            clock.tick(RENDER_FPS)
                 
+        self.sim_stop.set()
+        simulation.join()
+        if self.snapshot_path and self.agent_playing and self.game_state == "game_over":
+            self.save_run() # a round in progress is played again from the last snapshot
+        self.profiler.close()
         pygame.quit()
         sys.exit()
 
@@ -574,13 +924,33 @@ def check_resources():
     return True
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Blackjack GUI with the ALAN agent")
+    parser.add_argument("--perf-overlay", action="store_true", help="show the frame profiler overlay (toggle with F3)")
+    parser.add_argument("--perf-log", metavar="PATH", help="write per-frame phase timings to a CSV file")
+    parser.add_argument("--max-frames", type=int, metavar="N", help="quit after N frames (e.g. to profile a bounded run)")
+    parser.add_argument("--ai", action="store_true", help="start in AI Play mode")
+    parser.add_argument("--seats", type=int, default=1, choices=range(1, MAX_SEATS + 1), help="player hands per dealer hand")
+    parser.add_argument("--snapshot", metavar="PATH", help="save the AI's run to PATH and resume from it if it exists")
+    parser.add_argument("--snapshot-every", type=int, default=100, metavar="N", help="rounds between snapshots")
+    parser.add_argument("--exploring-starts", action="store_true",
+                        help="start every hand in a uniformly drawn (total, soft, upcard) state instead of dealing it")
+    parser.add_argument("--q-checkpoint", metavar="PATH", help="Q-table kept at PATH, only CSV rows appended since it was saved are trained on")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     if not check_resources():
         print("Error: Missing required resources. Please ensure all card images are present in the 'cards' directory.")
         sys.exit(1)
     
     try:
-        game = Game()
-        game.run()
+        with profiled(args):
+            game = Game(perf_overlay=args.perf_overlay, perf_log=args.perf_log, seats=args.seats,
+                        snapshot=args.snapshot, snapshot_every=args.snapshot_every, q_checkpoint=args.q_checkpoint,
+                        starts=ExploringStarts() if args.exploring_starts else None)
+            if args.ai and not game.agent_playing:
+                game.toggle_ai_play()
+            game.run(max_frames=args.max_frames)
     except Exception as e:
         print(f"An error occurred: {e}")
         pygame.quit()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+from evaluate import REWARDS, compile_policy, evaluate_policy, summarize, z_score
+
+RULES = "benchmark_bj" # rule set played by evaluate.play_hands, part of every key
+
+def policy_fingerprint(table):
+    """Hash of a compiled policy lookup table"""
+    return hashlib.sha256(str(table.shape).encode() + table.astype('int8').tobytes()).hexdigest()
+
+class EvaluationCache:
+    """On-disk cache of policy evaluations keyed by policy fingerprint, rules, shoe settings, payoffs
+    and seed. Entries store the evaluation's sufficient statistics, so a request for more hands or a
+    tighter tolerance only plays the missing batches. The least recently used entries are evicted
+    beyond max_entries"""
+    def __init__(self, cache_dir=".eval_cache", max_entries=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, table, decks, seed, payoffs, batch_size):
+        settings = {
+            'policy': policy_fingerprint(table),
+            'rules': RULES,
+            'decks': decks,
+            'seed': seed,
+            'payoffs': payoffs,
+            'batch_size': batch_size, # batches are seeded by index, so their size is part of the stream
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def load(self, key):
+        """Stored stats for key or None, marking the entry as recently used"""
+        path = self.path(key)
+        try:
+            with open(path) as file:
+                stats = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path) # the modification time doubles as the LRU timestamp
+        return stats
+
+    def store(self, key, stats):
+        path = self.path(key)
+        with open(path + ".tmp", "w") as file:
+            json.dump(stats, file)
+        os.replace(path + ".tmp", path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries beyond max_entries"""
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass # evicted concurrently
+
+    def evaluate(self, policy, hands=None, tolerance=None, confidence=0.95, decks=None, seed=0,
+                 payoffs=REWARDS, batch_size=100000, max_hands=10000000):
+        """evaluate_policy with caching: either at least `hands` hands, or until the CI half-width is
+        within `tolerance`. Served from the cache when the stored evaluation already satisfies the
+        request, otherwise extended from it. The result's 'cached' tells whether no hand was played"""
+        if hands is None and tolerance is None:
+            raise ValueError("Either hands or tolerance is required")
+        table = compile_policy(policy)
+        key = self.key(table, decks, seed, payoffs, batch_size)
+        stats = self.load(key)
+
+        if stats is not None:
+            result = summarize(stats, confidence)
+            enough_hands = hands is not None and stats['hands'] >= hands
+            precise = tolerance is not None and z_score(confidence) * result['stderr'] <= tolerance
+            if enough_hands or precise:
+                return dict(result, seed=seed, converged=precise, cached=True)
+            stats = dict(stats, seed=seed)
+
+        result = evaluate_policy(table, tolerance=tolerance, confidence=confidence, batch_size=batch_size,
+                                 max_hands=hands if hands is not None else max_hands,
+                                 decks=decks, seed=seed, payoffs=payoffs, stats=stats)
+        self.store(key, {name: result[name] for name in ('hands', 'total', 'total_sq', 'wins', 'draws', 'losses', 'batches')})
+        return dict(result, cached=False)
@@ -0,0 +1,311 @@
+import math
+import sys
+from statistics import NormalDist
+import numpy as np
+
+# Card ranks are indexed A, 2, ..., 10, J, Q, K; VALUES maps a rank to its blackjack value
+VALUES = np.array([11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10], dtype=np.int64)
+MAX_CARDS = 40 # enough for the longest possible player + dealer sequence
+REWARDS = {'win': 3, 'loss': -1, 'draw': 1} # same reward scheme as the game and the dataset
+
+# Hand outcomes returned by play_hands
+LOSS, DRAW, WIN = -1, 0, 1
+
+def basic_strategy(state):
+    """decide_action's basic strategy expressed on a (player_value, dealer_card, ace) state"""
+    pvalue, d_upcard, ace = state
+    if ace:
+        if pvalue >= 19:
+            return "stay"
+        if pvalue == 18:
+            return "stay" if d_upcard <= 8 else "hit"
+        return "hit"
+    if pvalue >= 17:
+        return "stay"
+    if 13 <= pvalue <= 16:
+        return "hit" if d_upcard >= 7 else "stay"
+    if pvalue == 12:
+        return "stay" if 4 <= d_upcard <= 6 else "hit"
+    return "hit"
+
+def compile_policy(policy):
+    """Compile a policy into a lookup table indexed [player_value, dealer_card, ace] (1 hit / 0 stay).
+    Accepts an existing table, a BlackjackRLAgent, a Q-table (agent's {'hit','stay'} dicts or
+    benchmark_bj's [stay, hit] arrays) or a callable mapping a state to an action"""
+    if isinstance(policy, np.ndarray):
+        return policy.astype(np.int8)
+    if hasattr(policy, 'q_table'):
+        policy = policy.q_table
+
+    table = np.zeros((32, 12, 2), dtype=np.int8)
+    for pvalue in range(4, 22):
+        for dealer_card in range(2, 12):
+            for ace in (False, True):
+                state = (pvalue, dealer_card, ace)
+                if callable(policy):
+                    action = policy(state)
+                else:
+                    q = policy.get(state) # .get() does not grow a defaultdict
+                    if q is None:
+                        action = 'hit' # untrained states break ties on 'hit' like the agent
+                    elif isinstance(q, dict):
+                        action = 'hit' if q['hit'] >= q['stay'] else 'stay'
+                    else:
+                        action = 1 if q[1] > q[0] else 0
+                table[pvalue, dealer_card, int(ace)] = action in ('hit', 1)
+    return table
+
+def draw_cards(counts, u, deplete=True):
+    """Draw one card rank per row by inverse CDF over the remaining rank counts of each shoe"""
+    cum = np.cumsum(counts, axis=1)
+    target = u * cum[:, -1]
+    ranks = (cum <= target[:, None]).sum(axis=1)
+    if deplete:
+        counts[np.arange(len(ranks)), ranks] -= 1
+    return ranks
+
+def deal_shoes(u, decks=None):
+    """Turn uniforms of shape (hands, cards) into card values, each row dealt from its own
+    freshly shuffled shoe of `decks` decks (None for an infinite shoe)"""
+    hands, cards = u.shape
+    counts = np.full((hands, 13), 4 * (decks or 1), dtype=np.int64)
+    ranks = np.empty((hands, cards), dtype=np.int64)
+    for j in range(cards):
+        ranks[:, j] = draw_cards(counts, u[:, j], deplete=decks is not None)
+    return VALUES[ranks]
+
+def add_card(total, aces, value):
+    """Add a card to hand totals, aces tracks the aces still counted as 11"""
+    total = total + value
+    aces = aces + (value == 11)
+    for _ in range(2): # two soft aces can never both survive a single card
+        soften = (total > 21) & (aces > 0)
+        total = total - 10 * soften
+        aces = aces - soften
+    return total, aces
+
+def play_hands(table, values):
+    """Play one round per row of `values` (card values in shoe order) with benchmark_bj's rules:
+    dealer gets the first two cards, player the next two, then both draw from the rest of the row.
+    Returns the outcome of every hand (WIN, DRAW or LOSS)"""
+    hands = len(values)
+    rows = np.arange(hands)
+    zeros = np.zeros(hands, dtype=np.int64)
+
+    d_total, d_aces = add_card(*add_card(zeros, zeros, values[:, 0]), values[:, 1])
+    p_total, p_aces = add_card(*add_card(zeros, zeros, values[:, 2]), values[:, 3])
+    dealer_card = values[:, 0]
+    ace = (values[:, 2] == 11) | (values[:, 3] == 11)
+    player_bj = p_total == 21
+    dealer_bj = d_total == 21
+    n_cards = np.full(hands, 2)
+    ptr = np.full(hands, 4)
+
+    outcome = np.zeros(hands, dtype=np.int8)
+    active = np.ones(hands, dtype=bool)
+    stayed = np.zeros(hands, dtype=bool)
+
+    # Player's turn
+    while active.any():
+        idx = rows[active]
+        hit = table[p_total[idx], dealer_card[idx], ace[idx].astype(np.int64)] == 1
+        stayed[idx[~hit]] = True
+        active[idx[~hit]] = False
+
+        idx = idx[hit]
+        card = values[idx, ptr[idx]]
+        ptr[idx] += 1
+        n_cards[idx] += 1
+        ace[idx] |= card == 11
+        p_total[idx], p_aces[idx] = add_card(p_total[idx], p_aces[idx], card)
+
+        lost = (p_total[idx] > 21) | dealer_bj[idx]
+        won = ~lost & (p_total[idx] == 21)
+        outcome[idx[lost]] = LOSS
+        outcome[idx[won]] = WIN
+        active[idx[lost | won]] = False
+
+    # Naturals, checked once the player stays
+    natural = stayed & player_bj & (n_cards == 2)
+    outcome[natural & dealer_bj] = DRAW
+    outcome[natural & ~dealer_bj] = WIN
+    outcome[stayed & ~natural & dealer_bj] = LOSS
+    pending = stayed & ~natural & ~dealer_bj
+
+    # Dealer's turn, stays on 17
+    drawing = pending & (d_total < 17)
+    while drawing.any():
+        idx = rows[drawing]
+        card = values[idx, ptr[idx]]
+        ptr[idx] += 1
+        d_total[idx], d_aces[idx] = add_card(d_total[idx], d_aces[idx], card)
+        drawing = pending & (d_total < 17)
+
+    idx = rows[pending]
+    player, dealer = p_total[idx], d_total[idx]
+    outcome[idx] = np.where(
+        player == 21, WIN, np.where(
+        dealer > 21, WIN, np.where(
+        dealer == 21, LOSS, np.sign(player - dealer))))
+    return outcome
+
+def play_shoes(table, u, decks=None):
+    """Deal the shoes of uniforms u and play them, see deal_shoes and play_hands"""
+    return play_hands(table, deal_shoes(u, decks))
+
+def engine_module(engine):
+    """Module providing deal_shoes, play_hands and play_shoes for an engine: 'numpy' (this module,
+    vectorized), 'kernel' (kernel.py, compiled with Numba if installed, plain Python otherwise) or
+    'auto' (the kernel only when Numba is installed). All engines deal the same cards and give
+    identical outcomes"""
+    if engine not in ('auto', 'numpy', 'kernel'):
+        raise ValueError(f"Unknown engine '{engine}', expected 'auto', 'numpy' or 'kernel'")
+    if engine != 'numpy':
+        import kernel # imports Numba, only when asked for
+        if engine == 'kernel' or kernel.HAVE_NUMBA:
+            return kernel
+    return sys.modules[__name__]
+
+def batch_rng(seed, batch):
+    """Independent generator for every batch, so results do not depend on how batches are grouped"""
+    return np.random.default_rng([seed, batch])
+
+def new_stats():
+    """Sufficient statistics of an evaluation, can be extended with more batches later"""
+    return {'hands': 0, 'total': 0.0, 'total_sq': 0.0, 'wins': 0, 'draws': 0, 'losses': 0, 'batches': 0}
+
+def antithetic(u):
+    """Mirror uniforms so that low cards are swapped with high ones (capped below 1 for draw_cards)"""
+    return np.minimum(1.0 - u, np.nextafter(1.0, 0.0))
+
+def hand_rewards(outcome, payoffs=REWARDS):
+    """Map outcomes to rewards under the given payoffs"""
+    return np.select([outcome == WIN, outcome == LOSS], [payoffs['win'], payoffs['loss']], payoffs['draw'])
+
+def update_stats(stats, outcome, payoffs=REWARDS):
+    """Accumulate a batch of outcomes into stats"""
+    rewards = hand_rewards(outcome, payoffs)
+    stats['hands'] += len(outcome)
+    stats['total'] += float(rewards.sum())
+    stats['total_sq'] += float((rewards.astype(np.float64) ** 2).sum())
+    stats['wins'] += int((outcome == WIN).sum())
+    stats['draws'] += int((outcome == DRAW).sum())
+    stats['losses'] += int((outcome == LOSS).sum())
+    stats['batches'] += 1
+    return stats
+
+def z_score(confidence):
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+def summarize(stats, confidence=0.95):
+    """EV, outcome rates and the confidence interval of the EV from accumulated stats"""
+    n = stats['hands']
+    if n == 0:
+        return dict(stats, ev=0.0, stderr=math.inf, ci=(-math.inf, math.inf), win_rate=0.0, draw_rate=0.0, loss_rate=0.0)
+    ev = stats['total'] / n
+    variance = max(stats['total_sq'] / n - ev ** 2, 0.0) * n / max(n - 1, 1)
+    stderr = math.sqrt(variance / n)
+    half_width = z_score(confidence) * stderr
+    return dict(stats,
+                ev=ev,
+                stderr=stderr,
+                ci=(ev - half_width, ev + half_width),
+                win_rate=stats['wins'] / n,
+                draw_rate=stats['draws'] / n,
+                loss_rate=stats['losses'] / n)
+
+def evaluate_policy(policy, tolerance=0.01, confidence=0.95, batch_size=100000, max_hands=10000000,
+                    decks=None, seed=None, payoffs=REWARDS, stats=None, engine='auto'):
+    """Estimate the EV of a policy by playing vectorized batches of hands. Stops as soon as the
+    confidence interval half-width is within `tolerance` (None plays exactly max_hands).
+    Passing a previous result as `stats` continues that evaluation with the same seed.
+    `engine` picks the implementation (see engine_module), the results do not depend on it"""
+    table = compile_policy(policy)
+    play_shoes = engine_module(engine).play_shoes
+    if stats is not None:
+        seed = stats.get('seed', seed)
+        stats = {key: stats[key] for key in new_stats()}
+    else:
+        stats = new_stats()
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**63)
+    z = z_score(confidence)
+
+    while stats['hands'] < max_hands:
+        result = summarize(stats, confidence)
+        if tolerance is not None and stats['hands'] > 1 and z * result['stderr'] <= tolerance:
+            break
+        # Hand i is always row i % batch_size of batch i // batch_size, so a continued evaluation
+        # finishes a short last batch from its own stream and matches a fresh run of the same size
+        batch, offset = divmod(stats['hands'], batch_size)
+        hands = min(batch_size - offset, max_hands - stats['hands'])
+        u = batch_rng(seed, batch).random((offset + hands, MAX_CARDS))[offset:]
+        update_stats(stats, play_shoes(table, u, decks), payoffs)
+
+    result = summarize(stats, confidence)
+    result['seed'] = seed
+    result['converged'] = tolerance is not None and z * result['stderr'] <= tolerance
+    return result
+
+def compare_policies(policy_a, policy_b, tolerance=0.01, confidence=0.95, batch_size=100000, max_hands=10000000,
+                     decks=None, seed=None, antithetic_shoes=False, payoffs=REWARDS, engine='auto'):
+    """Paired comparison of two policies with common random numbers: both play exactly the same
+    shoes, optionally also their antithetic mirror, and the EV difference (a - b) is estimated from
+    the per-shoe differences. Stops when the difference's CI half-width is within `tolerance`"""
+    table_a, table_b = compile_policy(policy_a), compile_policy(policy_b)
+    engine = engine_module(engine)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**63)
+    z = z_score(confidence)
+    shoes_per_pair = 2 if antithetic_shoes else 1
+    pairs = batch = 0
+    sums = {'a': 0.0, 'b': 0.0, 'diff': 0.0}
+    squares = {'a': 0.0, 'b': 0.0, 'diff': 0.0}
+
+    def variance(key):
+        mean = sums[key] / pairs
+        return max(squares[key] / pairs - mean ** 2, 0.0) * pairs / max(pairs - 1, 1)
+
+    while pairs * shoes_per_pair < max_hands:
+        if tolerance is not None and pairs > 1 and z * math.sqrt(variance('diff') / pairs) <= tolerance:
+            break
+        hands = min(batch_size, (max_hands - pairs * shoes_per_pair) // shoes_per_pair)
+        if hands == 0:
+            break
+        u = batch_rng(seed, batch).random((hands, MAX_CARDS))
+        shoes = [engine.deal_shoes(u, decks)]
+        if antithetic_shoes:
+            shoes.append(engine.deal_shoes(antithetic(u), decks))
+        rewards_a = sum(hand_rewards(engine.play_hands(table_a, values), payoffs) for values in shoes) / shoes_per_pair
+        rewards_b = sum(hand_rewards(engine.play_hands(table_b, values), payoffs) for values in shoes) / shoes_per_pair
+        for key, rewards in (('a', rewards_a), ('b', rewards_b), ('diff', rewards_a - rewards_b)):
+            sums[key] += float(rewards.sum())
+            squares[key] += float((rewards ** 2).sum())
+        pairs += hands
+        batch += 1
+
+    stderr = math.sqrt(variance('diff') / pairs) if pairs else math.inf
+    ev_diff = sums['diff'] / pairs if pairs else 0.0
+    independent = variance('a') + variance('b') if pairs else 0.0
+    return {
+        'hands': pairs * shoes_per_pair,
+        'pairs': pairs,
+        'ev_a': sums['a'] / pairs if pairs else 0.0,
+        'ev_b': sums['b'] / pairs if pairs else 0.0,
+        'ev_diff': ev_diff,
+        'stderr': stderr,
+        'ci': (ev_diff - z * stderr, ev_diff + z * stderr),
+        # share of the variance left compared to evaluating both policies on independent shoes
+        'variance_ratio': variance('diff') / independent if independent else 0.0,
+        'seed': seed,
+        'antithetic': antithetic_shoes,
+        'converged': tolerance is not None and z * stderr <= tolerance,
+    }
+
+def print_report(name, result):
+    low, high = result['ci']
+    print(f"{name}: {result['hands']} hands, EV {result['ev']:+.4f} [{low:+.4f}, {high:+.4f}]")
+    print(f"Win: {result['win_rate'] * 100:.2f}%, Draw: {result['draw_rate'] * 100:.2f}%, Loss: {result['loss_rate'] * 100:.2f}%")
+
+if __name__ == "__main__":
+    print_report("Basic strategy", evaluate_policy(basic_strategy, seed=0))
@@ -0,0 +1,88 @@
+import random
+from collections import Counter
+
+# Decision states a hand can start in, (player total, soft, dealer upcard) with soft meaning the
+# hand holds an ace and aces valued 11. Naturals are left out, there is no decision to learn there
+DEALER_UPCARDS = range(2, 12)
+HARD_TOTALS = range(4, 21) # two cards without an ace
+SOFT_TOTALS = range(12, 21) # an ace and any other card
+START_STATES = [(total, soft, up)
+                for soft, totals in ((False, HARD_TOTALS), (True, SOFT_TOTALS))
+                for total in totals
+                for up in DEALER_UPCARDS]
+
+def start_values(total, soft):
+    """Ordered (first, second) card value pairs of the two-card hands with this total"""
+    if soft:
+        other = total - 11
+        return [(11, 11)] if other == 1 else [(11, other), (other, 11)]
+    return [(first, total - first) for first in range(2, 11) if 2 <= total - first <= 10]
+
+def pair_weights(pairs, counts):
+    """Number of ways to draw each ordered pair of card values from a deck with these value counts"""
+    return [counts[first] * (counts[second] - (first == second)) for first, second in pairs]
+
+class ExploringStarts:
+    """Starts hands in chosen (player total, soft, dealer upcard) states instead of dealing them naturally,
+    so rare states such as soft 13-17 are visited as often as hard 20. States are drawn uniformly or with
+    custom weights and their cards are taken out of the shoe, every other card is dealt from it as usual"""
+    def __init__(self, states=None, weights=None):
+        """states defaults to every decision state in START_STATES, weights (one per state) to uniform"""
+        self.states = list(START_STATES if states is None else states)
+        self.weights = [1.0] * len(self.states) if weights is None else [float(weight) for weight in weights]
+        invalid = [state for state in self.states if tuple(state) not in START_STATES]
+        if invalid:
+            raise ValueError(f"No two-card hand starts in {invalid[0]}, expected (total, soft, upcard) from START_STATES")
+        if len(self.weights) != len(self.states):
+            raise ValueError(f"Got {len(self.weights)} weights for {len(self.states)} states")
+        if min(self.weights, default=0) < 0 or sum(self.weights) <= 0:
+            raise ValueError("Weights must be non-negative with a positive sum")
+        self.pairs = [start_values(total, soft) for total, soft, _ in self.states]
+
+    def choose(self, counts, up=None, rng=random):
+        """Index of a state drawn by weight among those the value counts can deal (with the dealer's upcard up
+        once it is set), None if there is none"""
+        weights = []
+        for (_, _, state_up), pairs, weight in zip(self.states, self.pairs, self.weights):
+            if up is not None:
+                feasible = state_up == up and any(pair_weights(pairs, counts))
+            elif counts[state_up]:
+                counts[state_up] -= 1 # the upcard is taken before the player's cards
+                feasible = any(pair_weights(pairs, counts))
+                counts[state_up] += 1
+            else:
+                feasible = False
+            weights.append(weight if feasible else 0.0)
+        if not any(weights):
+            return None
+        return rng.choices(range(len(self.states)), weights=weights)[0]
+
+    def deal_cards(self, cards, values, seats=1, rng=random):
+        """Take a round's starting cards out of cards (values holds their card values, ace 11): the dealer's
+        upcard and two cards for every seat, each seat in a state of its own against the same upcard.
+        Returns (upcard, hands), or None leaving cards untouched if the deck cannot deal the states"""
+        counts = Counter(values)
+        taken = set()
+
+        def take(value):
+            index = rng.choice([i for i, card_value in enumerate(values) if card_value == value and i not in taken])
+            taken.add(index)
+            counts[value] -= 1
+            return index
+
+        up = None
+        hands = []
+        for _ in range(seats):
+            state = self.choose(counts, up, rng)
+            if state is None:
+                return None
+            if up is None:
+                up = self.states[state][2]
+                up_index = take(up)
+            pairs = self.pairs[state]
+            first, second = rng.choices(pairs, weights=pair_weights(pairs, counts))[0]
+            hands.append((take(first), take(second)))
+
+        dealt = {index: cards[index] for index in taken}
+        cards[:] = [card for i, card in enumerate(cards) if i not in taken]
+        return dealt[up_index], [[dealt[first], dealt[second]] for first, second in hands]
@@ -0,0 +1,154 @@
+import numpy as np
+
+# Numba is optional: without it the kernel runs as plain Python (same results, much slower)
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Hand outcomes, the same codes as evaluate.LOSS, DRAW and WIN
+LOSS, DRAW, WIN = -1, 0, 1
+VALUES = np.array([11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10], dtype=np.int64) # evaluate.VALUES
+NO_UNIFORMS = np.empty(0, dtype=np.float64)
+NO_VALUES = np.empty(0, dtype=np.int64)
+
+@njit(cache=True)
+def new_shoe(shoe, decks):
+    """Reset a shoe: the count of every rank, then the number of cards left at index 13"""
+    shoe[:13] = 4 * max(decks, 1)
+    shoe[13] = 52 * max(decks, 1)
+
+@njit(cache=True)
+def draw_card(u, shoe, decks):
+    """Card value drawn by inverse CDF over the remaining rank counts, depleting the shoe unless
+    decks is 0 (infinite shoe). The same draw as evaluate.draw_cards"""
+    target = u * shoe[13]
+    if decks == 0:
+        # Every rank has 4 of 52 cards: the count of cumulative counts 4, 8, ... <= target
+        # (dividing by 4 is exact in floating point)
+        return VALUES[min(int(target / 4), 12)]
+    rank = 0
+    cum = shoe[0]
+    while rank < 12 and cum <= target:
+        rank += 1
+        cum += shoe[rank]
+    shoe[rank] -= 1
+    shoe[13] -= 1
+    return VALUES[rank]
+
+@njit(cache=True)
+def deal_rows(u, decks, values):
+    """Card values of every row of uniforms, each dealt from its own fresh shoe"""
+    shoe = np.empty(14, dtype=np.int64)
+    for i in range(u.shape[0]):
+        new_shoe(shoe, decks)
+        for j in range(u.shape[1]):
+            values[i, j] = draw_card(u[i, j], shoe, decks)
+
+@njit(cache=True)
+def add_card(total, aces, value):
+    """Add a card to a hand total, aces tracks the aces still counted as 11"""
+    total += value
+    if value == 11:
+        aces += 1
+    for _ in range(2): # two soft aces can never both survive a single card
+        if total > 21 and aces > 0:
+            total -= 10
+            aces -= 1
+    return total, aces
+
+@njit(cache=True)
+def next_card(k, row, u, shoe, decks):
+    """k-th card of the round: taken from row, or dealt on demand from uniforms u if given"""
+    if u.shape[0] > 0:
+        return draw_card(u[k], shoe, decks)
+    return row[k]
+
+@njit(cache=True)
+def play_round(table, row, u, shoe, decks):
+    """Play one round with benchmark_bj's rules, card for card the same as evaluate.play_hands.
+    Cards are consumed in shoe order, so dealing them on demand gives the same round as dealing
+    the whole row first. Returns WIN, DRAW or LOSS"""
+    dealer_card = next_card(0, row, u, shoe, decks)
+    d_total, d_aces = add_card(0, 0, dealer_card)
+    d_total, d_aces = add_card(d_total, d_aces, next_card(1, row, u, shoe, decks))
+    first = next_card(2, row, u, shoe, decks)
+    second = next_card(3, row, u, shoe, decks)
+    p_total, p_aces = add_card(0, 0, first)
+    p_total, p_aces = add_card(p_total, p_aces, second)
+    ace = 1 if first == 11 or second == 11 else 0
+    player_bj = p_total == 21
+    dealer_bj = d_total == 21
+    n_cards = 2
+    ptr = 4
+
+    # Player's turn
+    while table[p_total, dealer_card, ace] == 1:
+        card = next_card(ptr, row, u, shoe, decks)
+        ptr += 1
+        n_cards += 1
+        if card == 11:
+            ace = 1
+        p_total, p_aces = add_card(p_total, p_aces, card)
+        if p_total > 21 or dealer_bj:
+            return LOSS
+        if p_total == 21:
+            return WIN
+
+    # Naturals, checked once the player stays
+    if player_bj and n_cards == 2:
+        return DRAW if dealer_bj else WIN
+    if dealer_bj:
+        return LOSS
+
+    # Dealer's turn, stays on 17
+    while d_total < 17:
+        d_total, d_aces = add_card(d_total, d_aces, next_card(ptr, row, u, shoe, decks))
+        ptr += 1
+
+    if p_total == 21 or d_total > 21:
+        return WIN
+    if d_total == 21:
+        return LOSS
+    if p_total > d_total:
+        return WIN
+    if p_total < d_total:
+        return LOSS
+    return DRAW
+
+@njit(cache=True)
+def play_rounds(table, values, outcome):
+    shoe = np.empty(14, dtype=np.int64)
+    for i in range(values.shape[0]):
+        outcome[i] = play_round(table, values[i], NO_UNIFORMS, shoe, 0)
+
+@njit(cache=True)
+def play_shoe_rounds(table, u, decks, outcome):
+    shoe = np.empty(14, dtype=np.int64)
+    for i in range(u.shape[0]):
+        new_shoe(shoe, decks)
+        outcome[i] = play_round(table, NO_VALUES, u[i], shoe, decks)
+
+def deal_shoes(u, decks=None):
+    """Drop-in replacement for evaluate.deal_shoes, identical card values"""
+    values = np.empty(u.shape, dtype=np.int64)
+    deal_rows(np.ascontiguousarray(u, dtype=np.float64), decks or 0, values)
+    return values
+
+def play_hands(table, values):
+    """Drop-in replacement for evaluate.play_hands, identical outcomes for the same table and card values"""
+    outcome = np.empty(len(values), dtype=np.int8)
+    play_rounds(np.ascontiguousarray(table, dtype=np.int8), np.ascontiguousarray(values, dtype=np.int64), outcome)
+    return outcome
+
+def play_shoes(table, u, decks=None):
+    """play_hands(table, deal_shoes(u, decks)) in one pass, only dealing the cards a round uses"""
+    outcome = np.empty(len(u), dtype=np.int8)
+    play_shoe_rounds(np.ascontiguousarray(table, dtype=np.int8), np.ascontiguousarray(u, dtype=np.float64), decks or 0, outcome)
+    return outcome
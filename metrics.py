@@ -0,0 +1,118 @@
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+TD_ERROR_BUCKETS = (0.01, 0.1, 0.5, 1.0, 2.0, 4.0, math.inf) # upper bounds of |TD error|
+
+class AgentMetrics:
+    """Counters, timers and a TD-error histogram for a BlackjackRLAgent, periodically exported
+    as JSON lines or as a Prometheus text file. Agents only touch it when metrics are enabled"""
+    def __init__(self, export_path=None, export_format='jsonl', interval=10.0):
+        """Initialize metrics, exporting to export_path every interval seconds ('jsonl' or 'prometheus')"""
+        if export_format not in ('jsonl', 'prometheus'):
+            raise ValueError(f"Unknown metrics format '{export_format}', expected 'jsonl' or 'prometheus'")
+        self.export_path = export_path
+        self.export_format = export_format
+        self.interval = interval
+        self.counters = defaultdict(int) # updates, episodes, samples, env_steps
+        self.timers = defaultdict(float) # seconds spent in learn (every Q-value update path), sample, env_step
+        self.td_histogram = [0] * len(TD_ERROR_BUCKETS)
+        self.td_sum = 0.0
+        self.started = time.perf_counter()
+        self.last_export = self.started
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def add_time(self, name, seconds):
+        self.timers[name] += seconds
+
+    def observe_td_errors(self, td_errors):
+        """Add the absolute TD errors of a batch to the histogram"""
+        for td_error in td_errors:
+            error = abs(td_error)
+            self.td_sum += error
+            for i, bound in enumerate(TD_ERROR_BUCKETS):
+                if error <= bound:
+                    self.td_histogram[i] += 1
+                    break
+
+    def snapshot(self, agent) -> dict:
+        """Current values of all metrics, rates are averaged since the metrics were enabled"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        buffer = agent.replay_buffer
+        capacity = getattr(buffer, 'capacity', None) or buffer.buffer.maxlen
+        td_count = sum(self.td_histogram)
+        return {
+            'timestamp': time.time(),
+            'elapsed_seconds': elapsed,
+            'updates': self.counters['updates'],
+            'episodes': self.counters['episodes'],
+            'updates_per_second': self.counters['updates'] / elapsed,
+            'episodes_per_second': self.counters['episodes'] / elapsed,
+            'replay_size': len(buffer),
+            'replay_fill': len(buffer) / capacity,
+            'sample_latency_seconds': self.timers['sample'] / self.counters['samples'] if self.counters['samples'] else 0.0,
+            'q_table_states': len(agent.q_table),
+            'q_table_bytes': q_table_bytes(agent.q_table),
+            'epsilon': agent.epsilon,
+            'td_error_mean': self.td_sum / td_count if td_count else 0.0,
+            'td_error_histogram': dict(zip(map(str, TD_ERROR_BUCKETS), self.td_histogram)),
+            'learn_seconds': self.timers['learn'],
+            'env_step_seconds': self.timers['env_step'],
+        }
+
+    def maybe_export(self, agent):
+        """Export if an export path is set and the interval has elapsed"""
+        if self.export_path is not None and time.perf_counter() - self.last_export >= self.interval:
+            self.export(agent)
+
+    def flush(self, agent):
+        """Export now if an export path is set, so runs shorter than the interval are exported too"""
+        if self.export_path is not None:
+            self.export(agent)
+
+    def export(self, agent):
+        """Append a JSON line or atomically rewrite the Prometheus text file"""
+        self.last_export = time.perf_counter()
+        snapshot = self.snapshot(agent)
+        if self.export_format == 'jsonl':
+            with open(self.export_path, mode="a") as file:
+                file.write(json.dumps(snapshot) + "\n")
+            return
+        tmp_path = self.export_path + ".tmp"
+        with open(tmp_path, mode="w") as file:
+            file.write(prometheus_text(snapshot))
+        os.replace(tmp_path, self.export_path)
+
+def q_table_bytes(q_table) -> int:
+    """Approximate memory held by a Q-table: the dict itself plus its state keys and action dicts"""
+    size = sys.getsizeof(q_table)
+    for state, actions in q_table.items():
+        size += sys.getsizeof(state) + sys.getsizeof(actions)
+    return size
+
+def prometheus_text(snapshot) -> str:
+    """Render a metrics snapshot in the Prometheus text exposition format"""
+    lines = []
+    for name, kind in (('updates', 'counter'), ('episodes', 'counter'), ('learn_seconds', 'counter'),
+                       ('env_step_seconds', 'counter'), ('updates_per_second', 'gauge'),
+                       ('episodes_per_second', 'gauge'), ('replay_size', 'gauge'), ('replay_fill', 'gauge'),
+                       ('sample_latency_seconds', 'gauge'), ('q_table_states', 'gauge'),
+                       ('q_table_bytes', 'gauge'), ('epsilon', 'gauge')):
+        metric = f"blackjack_agent_{name}" + ("_total" if kind == 'counter' else "")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {snapshot[name]}")
+
+    lines.append("# TYPE blackjack_agent_td_error histogram")
+    cumulative = 0
+    for bound, count in zip(TD_ERROR_BUCKETS, snapshot['td_error_histogram'].values()):
+        cumulative += count
+        le = "+Inf" if bound == math.inf else bound
+        lines.append(f'blackjack_agent_td_error_bucket{{le="{le}"}} {cumulative}')
+    lines.append(f"blackjack_agent_td_error_sum {snapshot['td_error_mean'] * cumulative}")
+    lines.append(f"blackjack_agent_td_error_count {cumulative}")
+    return "\n".join(lines) + "\n"
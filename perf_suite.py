@@ -0,0 +1,244 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED = 1234
+CASES = {} # name -> (setup, number of calls per timing run)
+
+def case(name, number=1):
+    """Register a benchmark: the decorated setup function returns the callable to time"""
+    def register(setup):
+        CASES[name] = (setup, number)
+        return setup
+    return register
+
+def seed_everything(seed):
+    random.seed(seed)
+    try:
+        import numpy as np
+        np.random.seed(seed)
+    except ImportError:
+        pass
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the print calls of the code under test"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def gui_module():
+    """blackjack.py with a headless display, the GUI cases are skipped if pygame is missing"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    with quiet():
+        import blackjack
+    return blackjack
+
+def sim_hand(size=3):
+    from benchmark_bj import Deck
+    return Deck().deck[:size]
+
+##### HAND EVALUATION
+@case("hand_value", number=20000)
+def bench_hand_value():
+    from benchmark import hand_value
+    hand = sim_hand()
+    return lambda: hand_value(hand)
+
+@case("decide_action", number=20000)
+def bench_decide_action():
+    from benchmark import decide_action
+    dealer, player = sim_hand(2), sim_hand(3)
+    return lambda: decide_action(dealer, player)
+
+@case("calculate_hand", number=20000)
+def bench_calculate_hand():
+    blackjack = gui_module()
+    cards = blackjack.Deck().cards[:3]
+    return lambda: blackjack.Game.calculate_hand(None, cards)
+
+@case("get_state", number=20000)
+def bench_get_state():
+    blackjack = gui_module()
+    from agent import BlackjackRLAgent
+    agent = BlackjackRLAgent()
+    cards = blackjack.Deck().cards[:3]
+    return lambda: agent.get_state(cards[:2], cards[2])
+
+##### DECKS
+@case("sim_deck_deal_round", number=200)
+def bench_sim_deck_deal():
+    from benchmark_bj import Deck
+    deck = Deck()
+    def deal():
+        if len(deck.deck) < 10:
+            deck.deck = deck.generate_deck()
+        for _ in range(5):
+            deck.deal_card()
+    return deal
+
+@case("sim_deck_reshuffle", number=20)
+def bench_sim_deck_reshuffle():
+    from benchmark_bj import Deck
+    return Deck.generate_deck
+
+@case("gui_deck_init", number=2)
+def bench_gui_deck_init():
+    blackjack = gui_module()
+    deck = blackjack.Deck()
+    return deck.init_deck
+
+##### AGENT
+def filled_agent():
+    from agent import BlackjackRLAgent
+    agent = BlackjackRLAgent()
+    for _ in range(agent.replay_buffer.buffer.maxlen):
+        state = (random.randint(4, 21), random.randint(2, 11), random.random() < 0.2)
+        agent.replay_buffer.add((state, random.choice(['hit', 'stay']), random.choice([3, -1, 1]), None))
+    return agent
+
+@case("replay_buffer_sample", number=200)
+def bench_replay_sample():
+    agent = filled_agent()
+    return lambda: agent.replay_buffer.sample(agent.batch_size)
+
+@case("learn_from_replay", number=200)
+def bench_learn_from_replay():
+    return filled_agent().learn_from_replay
+
+@case("train_from_csv", number=1)
+def bench_train_from_csv():
+    from agent import BlackjackRLAgent
+    # Fixed 2000-row slice of the shipped dataset
+    path = os.path.join(tempfile.mkdtemp(), "train.csv")
+    with open(os.path.join(SCRIPT_DIR, "game_log.csv")) as source, open(path, "w") as target:
+        for _ in range(2001):
+            target.write(source.readline())
+    def train():
+        with quiet():
+            BlackjackRLAgent().train_from_csv(path, epochs=1)
+    return train
+
+##### FULL ROUNDS
+@case("benchmark_rounds_100", number=1)
+def bench_benchmark_rounds():
+    import benchmark
+    workdir = tempfile.mkdtemp()
+    def play():
+        cwd = os.getcwd()
+        os.chdir(workdir) # benchmark.main appends to game_log.csv in the working directory
+        try:
+            with quiet():
+                benchmark.main(num_rounds=100)
+        finally:
+            os.chdir(cwd)
+    return play
+
+@case("vectorized_hands_100k", number=1)
+def bench_vectorized_hands():
+    import numpy as np
+    import evaluate
+    table = evaluate.compile_policy(evaluate.basic_strategy)
+    values = evaluate.deal_shoes(np.random.default_rng(SEED).random((100000, evaluate.MAX_CARDS)))
+    return lambda: evaluate.play_hands(table, values)
+
+@case("kernel_hands_100k", number=1)
+def bench_kernel_hands():
+    import numba # the pure-Python fallback is not worth timing
+    import numpy as np
+    import evaluate
+    import kernel
+    table = evaluate.compile_policy(evaluate.basic_strategy)
+    u = np.random.default_rng(SEED).random((100000, evaluate.MAX_CARDS))
+    return lambda: kernel.play_shoes(table, u, 6)
+
+def run_case(name, repeat, warmup, seed=SEED):
+    """Time a case: seeded setup, `warmup` untimed runs, then `repeat` runs of `number` calls each"""
+    setup, number = CASES[name]
+    seed_everything(seed)
+    try:
+        func = setup()
+    except ImportError as e:
+        return {'skipped': f"missing dependency: {e.name}"}
+    for _ in range(warmup * number):
+        func()
+    times = []
+    for run in range(repeat):
+        seed_everything(seed + run)
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - started) / number)
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+def compare(results, baseline, threshold):
+    """Cases whose median time grew by more than threshold (0.1 = 10%) against the baseline"""
+    regressions = []
+    for name, result in results['cases'].items():
+        old = baseline['cases'].get(name)
+        if not old or 'median' not in old or 'median' not in result:
+            continue
+        ratio = result['median'] / old['median']
+        print(f"{name:<24} {old['median'] * 1e6:12.2f} us -> {result['median'] * 1e6:12.2f} us  x{ratio:.2f}")
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation and learning hot paths")
+    parser.add_argument("--output", default="perf_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before a case counts as a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before timing")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': time.time(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': SEED,
+        'cases': {},
+    }
+    for name in CASES:
+        if args.filter not in name:
+            continue
+        result = run_case(name, args.repeat, args.warmup)
+        results['cases'][name] = result
+        if 'skipped' in result:
+            print(f"{name:<24} skipped ({result['skipped']})")
+        else:
+            print(f"{name:<24} median {result['median'] * 1e6:12.2f} us  (min {result['min'] * 1e6:.2f}, stdev {result['stdev'] * 1e6:.2f})")
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            for name, ratio in regressions:
+                print(f"Regression: {name} is x{ratio:.2f} slower than the baseline")
+            sys.exit(1)
+        print("No regressions.")
+
+if __name__ == "__main__":
+    main()
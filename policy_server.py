@@ -0,0 +1,172 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import threading
+import numpy as np
+
+class PolicyTable:
+    """Q-values of a checkpoint written by BlackjackRLAgent.save_q_table as arrays indexed
+    [player_sum, dealer_value, usable_ace], reloaded whenever the checkpoint file changes"""
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self.mtime = None
+        self.q = np.zeros((32, 12, 2, 2)) # last axis: hit, stay
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """Load the checkpoint if its file changed since the last load. A checkpoint that cannot be
+        read is reported once and the previous table is kept"""
+        try:
+            mtime = os.stat(self.checkpoint).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime # a broken file is not retried until it changes again
+        try:
+            with open(self.checkpoint) as file:
+                rows = json.load(file)['q_table']
+            q = np.zeros((32, 12, 2, 2))
+            for player_sum, dealer_value, usable_ace, q_hit, q_stay in rows:
+                if 0 <= player_sum < 32 and 0 <= dealer_value < 12:
+                    q[player_sum, dealer_value, int(usable_ace)] = (q_hit, q_stay)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not load {self.checkpoint}, keeping the previous table: {e!r}")
+            return False
+        self.q = q # swapped in whole, readers always see a complete table
+        print(f"Loaded {len(rows)} states from {self.checkpoint}")
+        return True
+
+    def lookup(self, states):
+        """Greedy actions and Q-values of an (n, 3) state array, ties go to 'hit' like the agent"""
+        q = self.q[states[:, 0], states[:, 1], states[:, 2]]
+        return np.where(q[:, 0] >= q[:, 1], 'hit', 'stay'), q
+
+class PendingRequest:
+    def __init__(self, states):
+        self.states = states
+        self.done = threading.Event()
+        self.actions = self.q_values = None
+        self.error = None
+
+class Batcher:
+    """Collects the states of concurrent requests and answers them with a single table lookup"""
+    def __init__(self, table, max_wait=0.002, max_batch=65536, reload_interval=1.0):
+        self.table = table
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.reload_interval = reload_interval
+        self.requests = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, states):
+        request = PendingRequest(states)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise RuntimeError(request.error)
+        return request.actions, request.q_values
+
+    def run(self):
+        """Batching thread. It must never die, or every later submit() would wait forever"""
+        while True:
+            try:
+                batch = [self.requests.get(timeout=self.reload_interval)]
+            except queue.Empty:
+                try:
+                    self.table.reload_if_changed()
+                except Exception as e:
+                    print(f"Reloading {self.table.checkpoint} failed: {e!r}")
+                continue
+            size = len(batch[0].states)
+            # Give concurrent requests a moment to join the batch
+            while size < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.states)
+
+            try:
+                self.table.reload_if_changed()
+                actions, q_values = self.table.lookup(np.concatenate([request.states for request in batch]))
+                start = 0
+                for request in batch:
+                    end = start + len(request.states)
+                    request.actions, request.q_values = actions[start:end], q_values[start:end]
+                    start = end
+            except Exception as e:
+                for request in batch:
+                    request.error = f"lookup failed: {e!r}"
+            for request in batch:
+                request.done.set()
+
+class DecisionHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line: {"states": [[player_sum, dealer_value, usable_ace], ...], "q_values": false}.
+    Replies {"actions": [...]} plus "q_values" ([hit, stay] per state) if asked, or {"error": ...}"""
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                states = np.array([[int(p), int(d), int(bool(a))] for p, d, a in request['states']], dtype=np.int64).reshape(-1, 3)
+                if ((states[:, 0] < 0) | (states[:, 0] > 31) | (states[:, 1] < 0) | (states[:, 1] > 11)).any():
+                    raise ValueError("player_sum must be within 0-31 and dealer_value within 0-11")
+                actions, q_values = self.server.batcher.submit(states)
+                reply = {'actions': actions.tolist()}
+                if request.get('q_values'):
+                    reply['q_values'] = q_values.tolist()
+            except (ValueError, KeyError, TypeError, RuntimeError) as e:
+                reply = {'error': str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+class TCPDecisionServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class UnixDecisionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+def make_server(checkpoint, address, max_wait=0.002):
+    """Decision server for a checkpoint on a Unix socket path or a (host, port) tuple"""
+    if isinstance(address, str):
+        if os.path.exists(address):
+            if not stat.S_ISSOCK(os.stat(address).st_mode):
+                raise FileExistsError(f"{address} exists and is not a socket")
+            os.remove(address) # left behind by a previous server
+        server = UnixDecisionServer(address, DecisionHandler)
+    else:
+        server = TCPDecisionServer(address, DecisionHandler)
+    server.batcher = Batcher(PolicyTable(checkpoint), max_wait=max_wait)
+    return server
+
+def query(address, states, q_values=False):
+    """Client helper: ask a decision server about a list of (player_sum, dealer_value, usable_ace) states"""
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        sock.sendall((json.dumps({'states': [list(state) for state in states], 'q_values': q_values}) + "\n").encode())
+        with sock.makefile() as reply:
+            return json.loads(reply.readline())
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve hit/stay decisions from a Q-table checkpoint")
+    parser.add_argument("checkpoint", help="checkpoint written by BlackjackRLAgent.save_q_table")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-wait", type=float, default=0.002, help="seconds to wait for more requests to batch")
+    args = parser.parse_args()
+
+    address = args.unix or (args.host, args.port)
+    server = make_server(args.checkpoint, address, max_wait=args.max_wait)
+    print(f"Serving decisions from {args.checkpoint} on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
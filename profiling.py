@@ -0,0 +1,85 @@
+import contextlib
+import threading
+
+# (thread name, cProfile.Profile, finished Event) of every worker thread started through
+# profiled_thread while profiled() is active, None otherwise
+_thread_profiles = None
+
+def add_profile_arguments(parser):
+    """Add the --profile options shared by every entry point to an argparse parser"""
+    parser.add_argument("--profile", metavar="PATH", nargs="?", const="profile.prof",
+                        help="profile the run with cProfile and write the stats to PATH (default profile.prof)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, also trace allocations and dump a tracemalloc snapshot")
+    parser.add_argument("--profile-top", type=int, default=15, metavar="N",
+                        help="number of hotspots and allocation sites in the summary")
+
+def profiled_thread(target):
+    """Wrap a worker thread's target so profiled() records it too: cProfile only follows the thread
+    it was enabled on, so every worker gets a profiler of its own, merged into the stats on exit"""
+    def run(*args, **kwargs):
+        profiles = _thread_profiles
+        if profiles is None:
+            return target(*args, **kwargs)
+        import cProfile
+        profiler = cProfile.Profile()
+        finished = threading.Event()
+        profiles.append((threading.current_thread().name, profiler, finished))
+        profiler.enable()
+        try:
+            return target(*args, **kwargs)
+        finally:
+            profiler.disable()
+            finished.set()
+    return run
+
+@contextlib.contextmanager
+def profiled(args):
+    """Profile the enclosed code if --profile was given, writing the stats and printing a hotspot
+    summary on exit (also when the program exits through sys.exit). Threads started with a
+    profiled_thread target are included once they have finished"""
+    global _thread_profiles
+    if not args.profile:
+        yield
+        return
+
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    if args.profile_memory:
+        tracemalloc.start()
+    _thread_profiles = []
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        workers, _thread_profiles = _thread_profiles, None
+        if args.profile_memory:
+            # Snapshot before printing the summary, so the report's own allocations are left out
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        stats = pstats.Stats(profiler)
+        print(f"\n==================== PROFILE ====================")
+        for name, worker, finished in workers:
+            if finished.is_set():
+                stats.add(worker)
+            else:
+                print(f"Thread {name} was still running and is left out of the stats")
+        stats.dump_stats(args.profile)
+        print(f"cProfile stats written to {args.profile} (open with python -m pstats {args.profile})")
+        stats.sort_stats("cumulative").print_stats(args.profile_top)
+        print(f"Top {args.profile_top} functions by own time:")
+        stats.sort_stats("tottime").print_stats(args.profile_top)
+
+        if args.profile_memory:
+            snapshot_file = args.profile + ".tracemalloc"
+            snapshot.dump(snapshot_file)
+            print(f"tracemalloc snapshot written to {snapshot_file}")
+            print(f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB")
+            print(f"Top {args.profile_top} allocation sites:")
+            for stat in snapshot.statistics("lineno")[:args.profile_top]:
+                print(f"  {stat}")
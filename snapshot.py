@@ -0,0 +1,41 @@
+import os
+import random
+import sys
+
+def rng_state() -> dict:
+    """State of the random module and, once numpy is in use, of numpy's global generator"""
+    state = {'random': random.getstate()}
+    np = sys.modules.get('numpy')
+    if np is not None:
+        state['numpy'] = np.random.get_state()
+    return state
+
+def restore_rng(state: dict):
+    """Put the generators back in a state returned by rng_state"""
+    random.setstate(state['random'])
+    if 'numpy' in state:
+        import numpy as np
+        np.random.set_state(state['numpy'])
+
+def save_snapshot(path: str, state: dict):
+    """Pickle a run's state atomically: written to a temporary file, flushed to disk and then
+    renamed over the previous snapshot, so an interrupted write never leaves a broken one behind"""
+    import pickle
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+def load_snapshot(path: str, kind: str) -> dict:
+    """State saved by save_snapshot, or None if there is no snapshot at path. kind names the run
+    the snapshot must come from"""
+    if not path or not os.path.exists(path):
+        return None
+    import pickle
+    with open(path, "rb") as file:
+        state = pickle.load(file)
+    if state.get('kind') != kind:
+        raise ValueError(f"{path} is a snapshot of a '{state.get('kind')}' run, not '{kind}'")
+    return state
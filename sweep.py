@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Hyperparameters a spec may set, all passed to BlackjackRLAgent except batch_size
+AGENT_PARAMS = ('alpha', 'gamma', 'epsilon', 'epsilon_min', 'epsilon_decay', 'learning_mode', 'n_steps', 'lam', 'batch_size')
+
+def grid_configs(params):
+    """Every combination of the listed values"""
+    names = sorted(params)
+    return [dict(zip(names, values)) for values in itertools.product(*(params[name] for name in names))]
+
+def random_configs(params, samples, seed=0):
+    """`samples` random configurations: a list is sampled uniformly, a {"low", "high", "log"} dict
+    from a (log-)uniform range ("int": true rounds it)"""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(samples):
+        config = {}
+        for name in sorted(params):
+            space = params[name]
+            if isinstance(space, list):
+                config[name] = rng.choice(space)
+            elif space.get('log'):
+                config[name] = math.exp(rng.uniform(math.log(space['low']), math.log(space['high'])))
+            else:
+                config[name] = rng.uniform(space['low'], space['high'])
+            if isinstance(space, dict) and space.get('int'):
+                config[name] = int(round(config[name]))
+        configs.append(config)
+    return configs
+
+def expand_spec(spec):
+    """Configurations of a sweep spec: {"mode": "grid"|"random", "params": {...}, "samples": N}"""
+    unknown = set(spec['params']) - set(AGENT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters in spec: {', '.join(sorted(unknown))}")
+    if spec.get('mode', 'grid') == 'grid':
+        return grid_configs(spec['params'])
+    return random_configs(spec['params'], spec.get('samples', 10), spec.get('spec_seed', 0))
+
+def file_hash(path):
+    """SHA-256 of a file's contents, '' if it does not exist"""
+    if not path or not os.path.exists(path):
+        return ''
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def trial_key(task):
+    """Cache key of a trial: config, seed, data hash and the training/evaluation settings
+    (the data path itself is left out, only its contents matter)"""
+    keyed = {name: value for name, value in task.items() if name != 'data'}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+def run_trial(task):
+    """Train an agent with one configuration and seed headlessly, then evaluate its greedy policy.
+    Every configuration sees the same training shoes and evaluation shoes for a given seed"""
+    from agent import BlackjackRLAgent
+    from evaluate import evaluate_policy
+    from vector_env import VectorEnv, train_agent
+
+    config, seed = task['config'], task['seed']
+    random.seed(seed)
+    agent = BlackjackRLAgent(**{name: value for name, value in config.items() if name != 'batch_size'})
+    if 'batch_size' in config:
+        agent.batch_size = int(config['batch_size'])
+
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if task['data'] and task['epochs']:
+            agent.train_from_csv(task['data'], epochs=task['epochs'])
+        if task['self_play_steps']:
+            train_agent(agent, VectorEnv(task['num_envs'], seed=seed), task['self_play_steps'])
+    train_seconds = time.perf_counter() - started
+
+    agent.training_mode = False
+    result = evaluate_policy(agent, tolerance=None, max_hands=task['hands'], seed=task['eval_seed'] + seed)
+    return {
+        'config': config,
+        'seed': seed,
+        'ev': result['ev'],
+        'stderr': result['stderr'],
+        'win_rate': result['win_rate'],
+        'draw_rate': result['draw_rate'],
+        'loss_rate': result['loss_rate'],
+        'train_seconds': train_seconds,
+    }
+
+def run_sweep(spec, seeds=(0,), data="game_log.csv", epochs=5, self_play_steps=0, num_envs=64, hands=200000,
+              eval_seed=12345, workers=None, cache_dir=".sweep_cache"):
+    """Run every (configuration, seed) trial of a spec on a process pool, skipping trials already
+    in the on-disk cache. Returns the configurations ranked by mean EV over the seeds"""
+    data_hash = file_hash(data)
+    tasks = [{'config': config, 'seed': seed, 'data': data, 'data_hash': data_hash, 'epochs': epochs,
+              'self_play_steps': self_play_steps, 'num_envs': num_envs, 'hands': hands, 'eval_seed': eval_seed}
+             for config in expand_spec(spec) for seed in seeds]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    results, pending = [], []
+    for task in tasks:
+        cache_file = os.path.join(cache_dir, trial_key(task) + ".json")
+        if os.path.exists(cache_file):
+            with open(cache_file) as file:
+                results.append(json.load(file))
+        else:
+            pending.append((task, cache_file))
+    print(f"{len(tasks)} trials, {len(tasks) - len(pending)} cached, {len(pending)} to run")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_trial, task): cache_file for task, cache_file in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            tmp_file = futures[future] + ".tmp"
+            with open(tmp_file, "w") as file:
+                json.dump(result, file)
+            os.replace(tmp_file, futures[future])
+            results.append(result)
+            print(f"[{done}/{len(pending)}] {result['config']} seed {result['seed']}: EV {result['ev']:+.4f}")
+
+    return rank_results(results)
+
+def rank_results(results):
+    """Group trial results by configuration and sort by mean EV (best first)"""
+    grouped = {}
+    for result in results:
+        grouped.setdefault(json.dumps(result['config'], sort_keys=True), []).append(result)
+    ranking = []
+    for trials in grouped.values():
+        n = len(trials)
+        ranking.append({
+            'config': trials[0]['config'],
+            'seeds': n,
+            'ev': sum(trial['ev'] for trial in trials) / n,
+            'stderr': math.sqrt(sum(trial['stderr'] ** 2 for trial in trials)) / n,
+            'win_rate': sum(trial['win_rate'] for trial in trials) / n,
+            'train_seconds': sum(trial['train_seconds'] for trial in trials) / n,
+        })
+    return sorted(ranking, key=lambda row: row['ev'], reverse=True)
+
+def print_ranking(ranking):
+    print(f"\n{'rank':>4}  {'EV':>8}  {'±SE':>7}  {'win %':>6}  {'train s':>7}  config")
+    for rank, row in enumerate(ranking, 1):
+        config = ", ".join(f"{name}={value:.4g}" if isinstance(value, float) else f"{name}={value}"
+                           for name, value in sorted(row['config'].items()))
+        print(f"{rank:>4}  {row['ev']:+8.4f}  {row['stderr']:7.4f}  {row['win_rate'] * 100:6.2f}  {row['train_seconds']:7.1f}  {config}")
+
+def write_ranking(ranking, path):
+    names = sorted({name for row in ranking for name in row['config']})
+    with open(path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(['rank'] + names + ['seeds', 'ev', 'stderr', 'win_rate', 'train_seconds'])
+        for rank, row in enumerate(ranking, 1):
+            writer.writerow([rank] + [row['config'].get(name) for name in names] +
+                            [row['seeds'], row['ev'], row['stderr'], row['win_rate'], row['train_seconds']])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for BlackjackRLAgent")
+    parser.add_argument("spec", help='path to a JSON spec file, or the spec itself inline, e.g. {"mode": "grid", "params": {"alpha": [0.05, 0.1]}}')
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="training/evaluation seeds per configuration")
+    parser.add_argument("--data", default="game_log.csv", help="training CSV ('' to skip CSV training)")
+    parser.add_argument("--epochs", type=int, default=5, help="CSV training epochs")
+    parser.add_argument("--self-play-steps", type=int, default=0, help="VectorEnv steps of self-play after CSV training")
+    parser.add_argument("--num-envs", type=int, default=64, help="VectorEnv tables for self-play")
+    parser.add_argument("--hands", type=int, default=200000, help="evaluation hands per trial")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=".sweep_cache", help="directory of cached trial results")
+    parser.add_argument("--output", help="write the ranked table to this CSV file")
+    args = parser.parse_args()
+
+    if args.spec.lstrip().startswith("{"):
+        spec = json.loads(args.spec)
+    else:
+        with open(args.spec) as file:
+            spec = json.load(file)
+    ranking = run_sweep(spec, seeds=args.seeds, data=args.data, epochs=args.epochs,
+                        self_play_steps=args.self_play_steps, num_envs=args.num_envs, hands=args.hands,
+                        workers=args.workers, cache_dir=args.cache_dir)
+    print_ranking(ranking)
+    if args.output:
+        write_ranking(ranking, args.output)
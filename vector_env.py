@@ -0,0 +1,182 @@
+import time
+import numpy as np
+from evaluate import VALUES, REWARDS, draw_cards, add_card
+
+def value_ranks(value):
+    """Shoe ranks (indices of VALUES) of a card value"""
+    return np.flatnonzero(VALUES == value)
+
+def start_tables(starts):
+    """Rank tables of an ExploringStarts' states, padded with rank -1: the upcard ranks of every state
+    (states, 4) and the ordered rank pairs of its two-card hands (states, 16, 2)"""
+    up_ranks = np.full((len(starts.states), 4), -1, dtype=np.int64)
+    pair_ranks = np.full((len(starts.states), 16, 2), -1, dtype=np.int64)
+    for k, ((_, _, up), pairs) in enumerate(zip(starts.states, starts.pairs)):
+        ranks = value_ranks(up)
+        up_ranks[k, :len(ranks)] = ranks
+        rank_pairs = [(r1, r2) for first, second in pairs for r1 in value_ranks(first) for r2 in value_ranks(second)]
+        pair_ranks[k, :len(rank_pairs)] = rank_pairs
+    return up_ranks, pair_ranks
+
+def weighted_choice(weights, u):
+    """Column drawn by inverse CDF from every row of weights"""
+    cum = np.cumsum(weights, axis=1)
+    return np.minimum((cum <= (u * cum[:, -1])[:, None]).sum(axis=1), weights.shape[1] - 1)
+
+class VectorEnv:
+    """N independent blackjack tables stepped in lockstep, following Game's rules: the player may hit
+    until bust, on stay the dealer draws to 17 and the hands are compared. Tables whose hand ends are
+    dealt a new one straight away, so step() always returns the observation to act on next"""
+    def __init__(self, num_envs=64, decks=6, seed=None, payoffs=REWARDS, starts=None):
+        """Initialize the tables, each with its own shoe of `decks` decks (None for an infinite shoe).
+        With starts (an ExploringStarts) hands start in its states instead of being dealt naturally"""
+        self.num_envs = num_envs
+        self.decks = decks
+        self.payoffs = payoffs
+        self.rng = np.random.default_rng(seed)
+        self.counts = np.full((num_envs, 13), 4 * (decks or 1), dtype=np.int64)
+        self.player_total = np.zeros(num_envs, dtype=np.int64)
+        self.player_aces = np.zeros(num_envs, dtype=np.int64)
+        self.ace = np.zeros(num_envs, dtype=bool)
+        self.dealer_total = np.zeros(num_envs, dtype=np.int64)
+        self.dealer_aces = np.zeros(num_envs, dtype=np.int64)
+        self.dealer_card = np.zeros(num_envs, dtype=np.int64)
+        self.starts = starts
+        if starts is not None:
+            self.start_probs = np.array(starts.weights) / sum(starts.weights)
+            self.up_ranks, self.pair_ranks = start_tables(starts)
+
+    def draw(self, idx):
+        """Draw one card value from the shoe of every table in idx"""
+        counts = self.counts[idx]
+        ranks = draw_cards(counts, self.rng.random(len(idx)), deplete=self.decks is not None)
+        self.counts[idx] = counts
+        return VALUES[ranks]
+
+    def observations(self):
+        """Batched (player_sum, dealer_up, soft) observations, soft meaning the hand holds an ace"""
+        return np.stack([self.player_total, self.dealer_card, self.ace.astype(np.int64)], axis=1)
+
+    def deal(self, idx):
+        """Start a new hand on the tables in idx, reshuffling shoes that are past half"""
+        if self.decks is not None:
+            reshuffle = idx[self.counts[idx].sum(axis=1) < 26 * self.decks]
+            self.counts[reshuffle] = 4 * self.decks
+        zeros = np.zeros(len(idx), dtype=np.int64)
+        if self.starts is not None:
+            up, first, second = self.start_cards(idx)
+            hole = self.draw(idx)
+        else:
+            first, second = self.draw(idx), self.draw(idx)
+            hole, up = self.draw(idx), self.draw(idx)
+        self.player_total[idx], self.player_aces[idx] = add_card(*add_card(zeros, zeros, first), second)
+        self.ace[idx] = (first == 11) | (second == 11)
+        self.dealer_total[idx], self.dealer_aces[idx] = add_card(*add_card(zeros, zeros, hole), up)
+        self.dealer_card[idx] = up
+
+    def start_cards(self, idx):
+        """Upcard and player card values of start states drawn for the tables in idx, taken out of their shoes.
+        The cards of a state are drawn with the odds the shoe deals them, a shoe that cannot deal its state
+        is reshuffled"""
+        states = self.rng.choice(len(self.start_probs), size=len(idx), p=self.start_probs)
+        counts = self.counts[idx]
+        rows = np.arange(len(idx))
+        up_ranks, pair_ranks = self.up_ranks[states], self.pair_ranks[states]
+        for attempt in range(2):
+            up_weights = np.where(up_ranks >= 0, np.take_along_axis(counts, up_ranks.clip(0), axis=1), 0)
+            up = up_ranks[rows, weighted_choice(up_weights, self.rng.random(len(idx)))]
+            left = counts.copy()
+            if self.decks is not None:
+                left[rows, up] -= 1
+            first, second = pair_ranks[..., 0], pair_ranks[..., 1]
+            pair_weights = np.where(first >= 0, np.take_along_axis(left, first.clip(0), axis=1)
+                                    * (np.take_along_axis(left, second.clip(0), axis=1) - (first == second)), 0)
+            stuck = (up_weights.sum(axis=1) == 0) | (pair_weights.sum(axis=1) == 0)
+            if attempt or not stuck.any():
+                break
+            counts[stuck] = 4 * self.decks # a full shoe deals every state
+        pair = pair_ranks[rows, weighted_choice(pair_weights, self.rng.random(len(idx)))]
+        if self.decks is not None:
+            np.subtract.at(left, (rows, pair[:, 0]), 1)
+            np.subtract.at(left, (rows, pair[:, 1]), 1)
+            counts = left
+        self.counts[idx] = counts
+        return VALUES[up], VALUES[pair[:, 0]], VALUES[pair[:, 1]]
+
+    def reset(self):
+        """Deal a new hand on every table and return the observations"""
+        self.deal(np.arange(self.num_envs))
+        return self.observations()
+
+    def step(self, actions):
+        """Apply one action per table ('hit'/'stay' or 1/0).
+        Returns observations, rewards (+3 win, -1 loss, +1 draw, 0 hand continues), done mask and info"""
+        actions = np.asarray(actions)
+        hit = actions == 'hit' if actions.dtype.kind in 'UO' else actions.astype(bool)
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        idx = np.flatnonzero(hit)
+        card = self.draw(idx)
+        self.ace[idx] |= card == 11
+        self.player_total[idx], self.player_aces[idx] = add_card(self.player_total[idx], self.player_aces[idx], card)
+        busted = idx[self.player_total[idx] > 21]
+        rewards[busted] = self.payoffs['loss']
+        dones[busted] = True
+
+        idx = np.flatnonzero(~hit)
+        drawing = idx[self.dealer_total[idx] < 17] # dealer stay on 17
+        while len(drawing):
+            card = self.draw(drawing)
+            self.dealer_total[drawing], self.dealer_aces[drawing] = add_card(self.dealer_total[drawing], self.dealer_aces[drawing], card)
+            drawing = drawing[self.dealer_total[drawing] < 17]
+        player, dealer = self.player_total[idx], self.dealer_total[idx]
+        won = (dealer > 21) | (player > dealer)
+        lost = ~won & (dealer > player)
+        rewards[idx] = np.where(won, self.payoffs['win'], np.where(lost, self.payoffs['loss'], self.payoffs['draw']))
+        dones[idx] = True
+
+        final_observations = self.observations()
+        self.deal(np.flatnonzero(dones))
+        return self.observations(), rewards, dones, {'final_observations': final_observations}
+
+def as_state(observation):
+    """Convert an observation row into the agent's (player_sum, dealer_value, usable_ace) state"""
+    return (int(observation[0]), int(observation[1]), bool(observation[2]))
+
+def train_agent(agent, env, steps):
+    """Drive a BlackjackRLAgent on a VectorEnv with batched action selection and updates.
+    Epsilon decays once per finished hand, returns the number of hands and their mean reward"""
+    agent.training_mode = True
+    observations = env.reset()
+    episodes = [[] for _ in range(env.num_envs)] if agent.learning_mode != 'q' else None
+    finished = 0
+    total_reward = 0.0
+    for _ in range(steps):
+        states = [as_state(observation) for observation in observations]
+        actions = agent.choose_actions(states)
+        started = time.perf_counter()
+        observations, rewards, dones, _ = env.step(actions)
+        if agent.metrics is not None:
+            agent.metrics.add_time('env_step', time.perf_counter() - started)
+            agent.metrics.count('env_steps')
+            if agent.learning_mode == 'q': # learn_episode counts its own episodes
+                agent.metrics.count('episodes', int(dones.sum()))
+        if agent.learning_mode == 'q':
+            next_states = [None if done else as_state(observation) for observation, done in zip(observations, dones)]
+            agent.learn_batch([(state, action, float(reward), next_state)
+                               for state, action, reward, next_state in zip(states, actions, rewards, next_states)])
+        else:
+            # n-step and Q(λ) learn from whole episodes, kept per table until its hand ends
+            for i, (state, action, reward, done) in enumerate(zip(states, actions, rewards, dones)):
+                episodes[i].append((state, action, float(reward)))
+                if done:
+                    agent.learn_episode(episodes[i])
+                    episodes[i] = []
+        for _ in range(int(dones.sum())):
+            agent.decay_epsilon()
+        finished += int(dones.sum())
+        total_reward += float(rewards.sum())
+    if agent.metrics is not None:
+        agent.metrics.flush(agent)
+    return {'episodes': finished, 'mean_reward': total_reward / finished if finished else 0.0}